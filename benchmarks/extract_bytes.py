@@ -0,0 +1,59 @@
+"""
+Бенчмарк разбора сцены, полученной в памяти (например, по HTTP): extract_bytes против записи во временный файл и extract.
+Принимает файлы сцен, иначе использует синтетический .hiplc.
+
+python -m scene_parser.benchmarks.extract_bytes [сцена ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from scene_parser.benchmarks.houdini_scan import make_hiplc
+from scene_parser.product.sniff import extract, extract_bytes
+
+
+# Сколько раз разбираем каждую сцену
+REPEAT = 10
+
+
+def via_temp_file(data: bytes) -> dict:
+    """
+    Прежний путь: содержимое пишется во временный файл, который затем разбирается
+    """
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return extract(path)
+    finally:
+        os.remove(path)
+
+
+def run(parse, data) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        parse(data)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    paths = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            paths = [os.path.join(tmp, 'bench.hiplc')]
+            make_hiplc(paths[0], 64 * 1024 * 1024)
+
+        for path in paths:
+            with open(path, 'rb') as f:
+                data = f.read()
+            mb = len(data) / 1024 / 1024
+            print(f'{path}: {mb:.1f} МБ')
+            for name, parse in (('temp file', via_temp_file), ('bytes', extract_bytes),
+                                ('memoryview', lambda data: extract_bytes(memoryview(data)))):
+                elapsed = run(parse, data)
+                print(f'{name:>12}: {elapsed * 1000:8.1f} мс, {mb / elapsed:8.1f} МБ/с')
+
+
+if __name__ == '__main__':
+    main()
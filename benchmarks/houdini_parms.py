@@ -0,0 +1,108 @@
+"""
+Микробенчмарк разбора значений параметров Houdini: посимвольный разбор (как было раньше) против Houdini._parse_array.
+Значения берутся из всех .parm файлов переданных .hip/.hiplc, иначе используются синтетические анимированные параметры.
+
+python -m scene_parser.benchmarks.houdini_parms [сцена.hip ...]
+"""
+import sys
+import time
+
+from scene_parser.product.impl.Houdini import Houdini
+
+
+def legacy_parse_array(data):
+    """
+    Прежний разбор: значения собираются по одному символу, вложенный массив копируется и разбирается рекурсивно
+    """
+    result = []
+
+    i = 0
+    value = ''
+    while i < len(data):
+        if data[i] == '\t':
+            result.append(value)
+            value = ''
+        elif data[i:i+2] == '[ ':
+            i += 2
+            count = 1
+            arr = ""
+            while count != 0:
+                if i >= len(data):
+                    return result
+                if data[i] == '[':
+                    i += 1
+                    count += 1
+                elif data[i:i+3] == ' ] ':
+                    i += 2
+                    count -= 1
+                else:
+                    arr += data[i]
+                i += 1
+            value = legacy_parse_array(arr)
+            result.append(value)
+            value = ''
+        elif data[i:i+2] == ' ]':
+            return result
+        else:
+            value += data[i]
+        i += 1
+
+    if isinstance(value, str) and len(value) > 1:
+        if value[0] == '"' and value[-1] == '"':
+            value = value[1:-1]
+
+    result.append(value)
+    return result
+
+
+def get_values(line):
+    """
+    Отрезает от строки .parm имя и мета-данные, как это делает Houdini._parse_parms
+    """
+    line = line[line.find('\t') + 1:]
+    pos = line.find(']\t(\t')
+    return line[pos + 4:-2]
+
+
+def load_values(paths) -> list:
+    values = []
+    for path in paths:
+        houdini = Houdini(path)
+        houdini._buffer = houdini._open_buffer()
+        magic = houdini._buffer[:6]
+        for name, offset, size in houdini._index_entries(magic):
+            if name.endswith('.parm'):
+                for line in houdini._read_entry(offset, size).split('\n'):
+                    if line not in ('{', '}', ''):
+                        values.append(get_values(line))
+    return values
+
+
+def make_values(count: int = 2000, keys: int = 200) -> list:
+    """
+    Синтетические анимированные каналы: по keys ключей на параметр
+    """
+    channel = '\t'.join(f'[ ch\t{i}\t"bezier()"\t{i * 0.5} ] ' for i in range(keys))
+    return [f'[ f\t1 ] \t{channel}\t"$HIP/render/$OS.$F4.exr"'] * count
+
+
+def run(parse, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        parse(value)
+    return time.perf_counter() - start
+
+
+def main():
+    values = load_values(sys.argv[1:]) if len(sys.argv) > 1 else make_values()
+    size = sum(len(value) for value in values) / 1024 / 1024
+    print(f'{len(values)} значений, {size:.1f} МБ')
+
+    houdini = Houdini(None)
+    for name, parse in (('legacy', legacy_parse_array), ('single-pass', houdini._parse_array)):
+        elapsed = run(parse, values)
+        print(f'{name:>12}: {elapsed:8.3f} с, {size / elapsed:8.1f} МБ/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Бенчмарк чтения .hiplc: посимвольный поиск магии (как было раньше) против индекса по mmap в Houdini.
+Создаёт синтетический .hiplc заданного размера во временном каталоге.
+
+python -m scene_parser.benchmarks.houdini_scan [размер в МБ, по умолчанию 500]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from scene_parser.product.impl.Houdini import Houdini
+
+
+MAGIC = 'HouLC\x1a'
+
+
+def make_hiplc(path: str, size: int) -> None:
+    """
+    Пишет .hiplc из .variables, одной рендер-ноды и больших бесполезных файлов общим размером около size байт
+    """
+    entries = [
+        ('.variables', "set -g HIP = '/proj'\nset -g _HIP_SAVEVERSION = '19.5.303'\n"),
+        ('out/mantra1.parm', '{\nsoho_pipecmd\t[ 0\tlocks=0 ]\t(\t"mantra"\t)\n'
+                             'f\t[ 0\tlocks=0 ]\t(\t1\t240\t1\t)\n}\n'),
+    ]
+    filler = ('0123456789abcdef' * 64 + '\n') * 1024
+    with open(path, 'w') as f:
+        for name, data in entries:
+            f.write(f'{MAGIC}{"F" * 28}{name}\0{data}')
+        written = 0
+        i = 0
+        while written < size:
+            f.write(f'{MAGIC}{"F" * 28}obj/geo{i}.init\0')
+            for _ in range(16):
+                f.write(filler)
+            written += 16 * len(filler)
+            i += 1
+        f.write(f'{MAGIC}{"F" * 28}TRAILER!!!\0')
+
+
+def legacy_scan(path: str) -> int:
+    """
+    Обход архива прежним способом: имя и содержимое читаются по одному символу. Возвращает число файлов
+    """
+    count = 0
+    with open(path, 'r', errors='backslashreplace') as stream:
+        magic = stream.read(6)
+        while magic == MAGIC:
+            stream.read(28)
+            c = ''
+            while c != '\0':
+                c = stream.read(1)
+            delimiter = stream.read(6)
+            while delimiter != magic:
+                c = stream.read(1)
+                if len(c) == 0:
+                    break
+                delimiter = delimiter[1:] + c
+            else:
+                stream.seek(stream.tell() - 6)
+            count += 1
+            magic = stream.read(6)
+    return count
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.hiplc')
+        make_hiplc(path, size * 1024 * 1024)
+        mb = os.path.getsize(path) / 1024 / 1024
+        print(f'{path}: {mb:.1f} МБ')
+
+        start = time.perf_counter()
+        Houdini(path).extract()
+        elapsed = time.perf_counter() - start
+        print(f'{"mmap":>10}: {elapsed:8.3f} с, {mb / elapsed:8.1f} МБ/с')
+
+        start = time.perf_counter()
+        legacy_scan(path)
+        elapsed = time.perf_counter() - start
+        print(f'{"legacy":>10}: {elapsed:8.3f} с, {mb / elapsed:8.1f} МБ/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк задержки разбора \x05DocumentSummaryInformation на файл: чтение потока из OLE и MaxDocumentSummaryParser.
+Принимает .max файлы и каталоги с ними, иначе использует синтетические потоки.
+
+python -m scene_parser.benchmarks.max_summary [сцена.max | каталог ...]
+"""
+import statistics
+import struct
+import sys
+import time
+from pathlib import Path
+
+from scene_parser.parser.max_document_summary import MaxDocumentSummaryParser
+from scene_parser.parser.ole_reader import OleReader
+
+
+STREAM_NAME = '\x05DocumentSummaryInformation'
+
+# Сколько раз разбираем каждый поток
+REPEAT = 20
+
+
+def iter_max_files(paths):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(path.rglob('*.max'))
+        else:
+            yield path
+
+
+def pack_string(out: bytearray, string: str) -> None:
+    data = string.encode() + b'\0'
+    out += struct.pack('<I', len(data)) + data
+    out += b'\0' * ((4 - len(out) % 4) % 4)
+
+
+def make_summary(cameras: int, plugins: int, header: int = 48) -> bytes:
+    """
+    Синтетический поток: группы General, Used Plug-Ins и Render Data после заголовка размером header байт
+    """
+    groups = {
+        'General': ['3ds Max Version: 25.00', 'Build: 25.0.0.997', 'Saved As Version: 25.00'],
+        'Used Plug-Ins': [f'plugin{i}.dlo' for i in range(plugins)],
+        'Render Data': ['Render Width=1920', 'Render Height=1080', 'Animation Start=0', 'Animation End=100',
+                        'Render Output=C:\\render\\shot.exr', 'Renderer Name=V-Ray 6']
+                       + [f'Render Camera {i}=Camera{i:03}' for i in range(cameras)],
+    }
+    out = bytearray(b'\xfe\xff' + b'\1' * (header - 2))
+    for name, items in groups.items():
+        out += struct.pack('<I', 0x1e)
+        pack_string(out, name)
+        out += struct.pack('<II', 3, len(items))
+    out += struct.pack('<II', 0x101e, sum(len(items) for items in groups.values()))
+    for items in groups.values():
+        for item in items:
+            pack_string(out, item)
+    return bytes(out)
+
+
+def load_corpus(paths) -> list:
+    """
+    Возвращает [(имя, содержимое потока, время чтения потока из OLE), ...]
+    """
+    corpus = []
+    for path in iter_max_files(paths):
+        start = time.perf_counter()
+        try:
+            reader = OleReader(str(path))
+            try:
+                data = reader.read_stream(STREAM_NAME)
+            finally:
+                reader.close()
+        except OSError as e:
+            print(f'{path}: {e}')
+            continue
+        corpus.append((str(path), data, time.perf_counter() - start))
+    return corpus
+
+
+def make_corpus() -> list:
+    return [
+        (f'synthetic-{cameras}-{plugins}-{header}', make_summary(cameras, plugins, header), 0.0)
+        for cameras in (1, 10, 100)
+        for plugins in (10, 200)
+        for header in (48, 400)
+    ]
+
+
+def main():
+    corpus = load_corpus(sys.argv[1:]) if len(sys.argv) > 1 else make_corpus()
+    if not corpus:
+        return
+
+    latencies = []
+    for name, data, read_time in corpus:
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            MaxDocumentSummaryParser(data)
+        parse_time = (time.perf_counter() - start) / REPEAT
+        latencies.append(read_time + parse_time)
+        print(f'{len(data):8} Б, OLE {read_time * 1e6:9.1f} мкс, разбор {parse_time * 1e6:9.1f} мкс  {name}')
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f'{len(latencies)} файлов: медиана {statistics.median(latencies) * 1e6:.1f} мкс, '
+          f'p95 {p95 * 1e6:.1f} мкс, максимум {latencies[-1] * 1e6:.1f} мкс')
+
+
+if __name__ == '__main__':
+    main()
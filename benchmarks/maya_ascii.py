@@ -0,0 +1,70 @@
+"""
+Бенчмарк пропускной способности MayaASCIIParser в МБ/с.
+Если передан каталог, то разбираются все .ma файлы из него, иначе синтетическая сцена.
+
+python -m scene_parser.benchmarks.maya_ascii [каталог]
+"""
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+from scene_parser.parser.maya_ascii_parser import MayaASCIIParser
+
+
+REQUESTED = {
+    'requires': 'plugins[]',
+    'fileInfo/product': 'product',
+    'createNode/camera': 'cameras[]',
+    'select/:defaultRenderGlobals.ren': 'render',
+    'select/:defaultResolution.w': 'width',
+    'select/:defaultResolution.h': 'height',
+}
+
+
+def make_scene(meshes: int = 200, points: int = 20000) -> str:
+    """
+    Синтетическая сцена с большими многострочными setAttr
+    """
+    r = random.Random(0)
+    lines = [
+        '//Maya ASCII 2022 scene\n',
+        'requires maya "2022";\n',
+        'requires -nodeType "aiOptions" "mtoa" "4.2.1";\n',
+        'fileInfo "product" "Maya 2022";\n',
+    ]
+    for i in range(meshes):
+        lines.append(f'createNode camera -n "camShape{i}" -p "cam{i}";\n')
+        lines.append(f'createNode mesh -n "mesh{i}";\n')
+        lines.append(f'\tsetAttr -s {points} ".vt[0:{points - 1}]"')
+        for j in range(0, points, 4):
+            lines.append('\n\t\t' + ' '.join(f'{r.random():.5f}' for _ in range(4)))
+        lines.append(';\n')
+    lines.append('select -ne :defaultRenderGlobals;\n\tsetAttr ".ren" -type "string" "arnold";\n')
+    lines.append('select -ne :defaultResolution;\n\tsetAttr ".w" 1920;\n\tsetAttr ".h" 1080;\n')
+    return ''.join(lines)
+
+
+def main():
+    if len(sys.argv) > 1:
+        corpus = [(str(path), path.read_text(errors='backslashreplace')) for path in Path(sys.argv[1]).glob('**/*.ma')]
+    else:
+        corpus = [('synthetic', make_scene())]
+
+    total_size = 0
+    total_time = 0
+    for name, data in corpus:
+        start = time.perf_counter()
+        MayaASCIIParser(io.StringIO(data)).parse(REQUESTED)
+        elapsed = time.perf_counter() - start
+        size = len(data) / 1024 / 1024
+        total_size += size
+        total_time += elapsed
+        print(f'{name}: {size:.1f} МБ за {elapsed:.3f} с, {size / elapsed:.1f} МБ/с')
+
+    print(f'Итого: {total_size:.1f} МБ, {total_size / total_time:.1f} МБ/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Бенчмарк обхода IFF: рекурсивный обход против итеративного.
+Считает время, число блоков памяти, занятых на пике обхода (sys.getallocatedblocks), и пиковую память по tracemalloc
+на синтетическом вложенном файле. Кадры рекурсивного обхода лежат на стеке интерпретатора и не видны ни в одном из счётчиков.
+
+python -m scene_parser.benchmarks.maya_iff [глубина] [ширина]
+"""
+import gc
+import io
+import struct
+import sys
+import time
+import tracemalloc
+
+from scene_parser.parser.maya_iff_parser import MayaIFFParser
+
+
+def _chunk(chunk_id: bytes, payload: bytes) -> bytes:
+    pad = (4 - len(payload) % 4) % 4
+    return struct.pack('>4sL', chunk_id, len(payload)) + payload + b'\x00' * pad
+
+
+def _list(name: bytes, children: list) -> bytes:
+    body = name + b''.join(children)
+    return struct.pack('>4sL', b'FOR4', len(body)) + body
+
+
+def make_file(depth: int, width: int) -> tuple:
+    """
+    Строит FOR4-файл из width веток глубины depth. Возвращает (данные, число чанков, requested)
+    """
+    value = _chunk(b'DBLE', b'val\x00\x00' + struct.pack('>d', 1.0))
+    branches = []
+    for i in range(width):
+        node = _list(b'NODE', [value])
+        for _ in range(depth):
+            node = _list(b'NODE', [value, node])
+        branches.append(node)
+    data = _list(b'Maya', branches)
+
+    path = '/Maya' + '/NODE' * (depth + 1)
+    # Скалярное значение, чтобы в счётчиках был виден обход, а не собранный результат
+    requested = {f'{path}/val': 'deepest'}
+    return data, width * (depth + 1) * 2 + 1, requested
+
+
+def count_blocks(data: bytes, requested: dict, recursive: bool) -> int:
+    """
+    Сколько блоков памяти обход держит на пике. Число блоков снимается перед чтением каждого заголовка чанка
+    """
+    parser = MayaIFFParser(io.BytesIO(data))
+    read_header = parser._read_header
+    peak = 0
+
+    def counting_read_header():
+        nonlocal peak
+        peak = max(peak, sys.getallocatedblocks())
+        return read_header()
+
+    parser._read_header = counting_read_header
+    gc.collect()
+    base = sys.getallocatedblocks()
+    parser.parse(requested, recursive=recursive)
+    return peak - base
+
+
+def run(data: bytes, requested: dict, recursive: bool) -> tuple:
+    """
+    Возвращает (время в секундах, блоков на пике, пик выделенной памяти в байтах)
+    """
+    start = time.perf_counter()
+    MayaIFFParser(io.BytesIO(data)).parse(requested, recursive=recursive)
+    elapsed = time.perf_counter() - start
+
+    blocks = count_blocks(data, requested, recursive)
+
+    parser = MayaIFFParser(io.BytesIO(data))
+    tracemalloc.start()
+    parser.parse(requested, recursive=recursive)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, blocks, peak
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), depth * 4))
+
+    data, chunks, requested = make_file(depth, width)
+    print(f'{len(data)} байт, {chunks} чанков, глубина {depth}')
+    for name, recursive in (('recursive', True), ('iterative', False)):
+        elapsed, blocks, peak = run(data, requested, recursive)
+        print(f'{name:>10}: {elapsed * 1000:8.1f} мс, {blocks:7} блоков на пике ({blocks / chunks:.4f} на чанк), '
+              f'пик {peak / 1024:8.1f} КиБ')
+
+
+if __name__ == '__main__':
+    main()
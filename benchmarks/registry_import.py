@@ -0,0 +1,52 @@
+"""
+Бенчмарк холодного старта реестра парсеров через python -X importtime.
+Сравнивает полный скан get_product_parsers() с ленивым get_product_parser('hip').
+
+python -m scene_parser.benchmarks.registry_import
+"""
+import subprocess
+import sys
+
+
+SCENARIOS = {
+    'scan': 'from scene_parser.product.impl import get_product_parsers; get_product_parsers()',
+    'lazy hip': "from scene_parser.product.impl import get_product_parser; get_product_parser('hip')",
+}
+
+
+def measure(code: str) -> tuple:
+    """
+    Возвращает (число импортированных модулей, суммарное время импорта в мс)
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    modules = 0
+    total = 0
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time = line[len('import time:'):].split('|')[0]
+        modules += 1
+        total += int(self_time)
+    return modules, total / 1000
+
+
+def main():
+    for name, code in SCENARIOS.items():
+        try:
+            modules, total = measure(code)
+        except RuntimeError as e:
+            print(f'{name:>10}: ошибка: {e}')
+            continue
+        print(f'{name:>10}: {modules:5} модулей, {total:8.1f} мс')
+
+
+if __name__ == '__main__':
+    main()
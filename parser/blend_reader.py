@@ -0,0 +1,450 @@
+import gzip
+import io
+import mmap
+import os
+import re
+import struct
+from array import array
+from typing import Iterator, Optional
+
+from scene_parser.parser.buffer import as_buffer
+
+
+# Формат struct для простых типов DNA
+_TYPE_FORMATS = {
+    'char': 'b',
+    'uchar': 'B',
+    'short': 'h',
+    'ushort': 'H',
+    'int': 'i',
+    'uint': 'I',
+    'long': 'i',
+    'ulong': 'I',
+    'float': 'f',
+    'double': 'd',
+    'int8_t': 'b',
+    'uint8_t': 'B',
+    'int16_t': 'h',
+    'uint16_t': 'H',
+    'int32_t': 'i',
+    'uint32_t': 'I',
+    'int64_t': 'q',
+    'uint64_t': 'Q',
+    'bool': '?',
+}
+
+# Имя поля DNA без указателей и размерностей: "*next" -> next, "name[66]" -> name, "(*func)()" -> func
+_FIELD_NAME_RE = re.compile(r'\w+')
+
+# Размерности массива в имени поля: "mat[4][4]"
+_FIELD_DIMS_RE = re.compile(r'\[(\d+)\]')
+
+# Размер куска при потоковой распаковке
+_CHUNK_SIZE = 1 << 20
+
+# Значение по умолчанию для get: отсутствующее поле -- ошибка
+_missing = object()
+
+
+class BlendReader:
+    """
+    Читает .blend без bpy: заголовок, заголовки блоков и SDNA из блока DNA1.
+    Значения полей берутся прямо из байт блока по смещениям, посчитанным по SDNA
+    """
+
+    # Заголовки блоков: код, размер, старый указатель, индекс SDNA, количество структур
+    _bhead4 = ('4si4xii', 20)
+    _bhead8 = ('4si8xii', 24)
+    # Новый формат (BLENDER17-01v0500): код, индекс SDNA, старый указатель, размер и количество в 64 битах
+    _large_bhead8 = ('4si8xqq', 32)
+
+    def __init__(self, file):
+        """
+        file -- путь к файлу, открытый бинарный поток или содержимое файла (bytes, bytearray, memoryview)
+        """
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            buffer = as_buffer(file)
+            if self._is_compressed(buffer[:4]):
+                self._buffer = self._load(io.BytesIO(buffer))
+            else:
+                self._buffer = buffer
+        elif isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as f:
+                self._buffer = self._load(f)
+        else:
+            self._buffer = self._load(file)
+        self._owns_buffer = not isinstance(file, (bytes, bytearray, memoryview))
+
+        try:
+            self._read_header()
+            self._index_blocks()
+            self._read_dna()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self, f):
+        """
+        Несжатый файл отображается в память, сжатый распаковывается потоком
+        """
+        f.seek(0)
+        magic = f.read(4)
+        f.seek(0)
+        if magic[:2] == b'\x1f\x8b':
+            # gzip, до Blender 3.0
+            return self._inflate(gzip.GzipFile(fileobj=f, mode='rb'))
+        if magic == b'\x28\xb5\x2f\xfd':
+            # zstd, начиная с Blender 3.0
+            return self._inflate(self._open_zstd(f))
+        try:
+            return self._map(f)
+        except (AttributeError, OSError, ValueError):
+            f.seek(0)
+            return f.read()
+
+    @staticmethod
+    def _is_compressed(magic) -> bool:
+        return magic[:2] == b'\x1f\x8b' or magic == b'\x28\xb5\x2f\xfd'
+
+    @staticmethod
+    def _open_zstd(f):
+        """
+        Поток распаковки zstd через все кадры: compression.zstd (Python 3.14+) или пакет zstandard
+        """
+        try:
+            from compression import zstd
+            return zstd.ZstdFile(f)
+        except ImportError:
+            import zstandard
+            return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+
+    @staticmethod
+    def _read_exact(reader, size) -> bytes:
+        parts = []
+        while size > 0:
+            data = reader.read(min(size, _CHUNK_SIZE))
+            if not data:
+                break
+            parts.append(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def _inflate(self, reader) -> bytes:
+        """
+        Распаковывает файл потоком и оставляет только заголовок и блоки _keep_codes.
+        Содержимое остальных блоков распаковывается кусками и сразу выбрасывается, так что в памяти не оказывается весь файл.
+        Результат -- такой же blend файл, только без ненужных блоков
+        """
+        header = self._read_exact(reader, 12)
+        if header[7:8] not in (b'_', b'-'):
+            header += self._read_exact(reader, 5)
+        self._buffer = header
+        self._read_header()
+        bhead = self._bhead
+
+        out = bytearray(header[:self._first_block])
+        header = header[self._first_block:]
+        while True:
+            header += self._read_exact(reader, bhead.size - len(header))
+            if len(header) < bhead.size:
+                break
+            if self._large:
+                code, _, size, _ = bhead.unpack_from(header)
+            else:
+                code, size, _, _ = bhead.unpack_from(header)
+            if code == b'ENDB':
+                out += header
+                break
+
+            if code.split(b'\0', 1)[0] in self._keep_codes:
+                data = self._read_exact(reader, size)
+                out += header
+                out += data
+                if len(data) < size:
+                    break
+            else:
+                while size > 0:
+                    data = reader.read(min(size, _CHUNK_SIZE))
+                    if not data:
+                        break
+                    size -= len(data)
+            header = b''
+        return bytes(out)
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._owns_buffer and isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+
+    # Буфер открыт здесь, а не передан вызывающим, и закрывается в close
+    _owns_buffer = False
+
+    # Блоки, которые сохраняются при распаковке сжатого файла
+    _keep_codes = {b'SC', b'OB', b'DNA1'}
+
+    # Версия Blender, сохранившего файл, например 293 или 405
+    version = None
+
+    # Размер указателя: 4 или 8
+    pointer_size = None
+
+    # Префикс порядка байт для struct: < или >
+    _endian = '<'
+
+    # Заголовок блока: (struct.Struct, новый ли формат)
+    _bhead = None
+    _large = False
+
+    # Смещение первого блока
+    _first_block = None
+
+    # Индекс блоков по столбцам, см. _index_blocks
+    _codes = None
+    _offsets = None
+    _sizes = None
+    _sdna_indexes = None
+    _counts = None
+
+    def _read_header(self):
+        header = bytes(self._buffer[:17])
+        if not header.startswith(b'BLENDER'):
+            raise ValueError('Не blend файл')
+
+        if header[7:8] in (b'_', b'-'):
+            # BLENDER-v293: размер указателя, порядок байт, версия из трёх цифр
+            self.pointer_size = 4 if header[7:8] == b'_' else 8
+            self._endian = '<' if header[8:9] == b'v' else '>'
+            self.version = int(header[9:12])
+            self._first_block = 12
+            fmt, _ = self._bhead4 if self.pointer_size == 4 else self._bhead8
+        else:
+            # BLENDER17-01v0500: размер заголовка, версия формата, порядок байт, версия из четырёх цифр
+            size = int(header[7:9])
+            if header[9:10] != b'-' or header[10:12] != b'01' or header[12:13] != b'v':
+                raise ValueError(f'Неизвестный заголовок blend файла: {header!r}')
+            self.pointer_size = 8
+            self.version = int(header[13:17])
+            self._first_block = size
+            self._large = True
+            fmt, _ = self._large_bhead8
+        self._bhead = struct.Struct(self._endian + fmt)
+
+    def _index_blocks(self):
+        """
+        Один проход по заголовкам блоков до ENDB, содержимое не читается.
+        Индекс хранится по столбцам в массивах: код, смещение содержимого, размер, индекс SDNA, количество
+        """
+        codes = array('I')
+        offsets = array('q')
+        sizes = array('q')
+        sdna_indexes = array('i')
+        counts = array('q')
+
+        buf = self._buffer
+        bhead = self._bhead
+        end = len(buf)
+        pos = self._first_block
+        while pos + bhead.size <= end:
+            if self._large:
+                code, sdna_index, size, count = bhead.unpack_from(buf, pos)
+            else:
+                code, size, sdna_index, count = bhead.unpack_from(buf, pos)
+            if code == b'ENDB':
+                break
+            pos += bhead.size
+            if size < 0 or pos + size > end:
+                raise ValueError(f'Блок {code!r} выходит за конец файла')
+            codes.append(self._code_id(code))
+            offsets.append(pos)
+            sizes.append(size)
+            sdna_indexes.append(sdna_index)
+            counts.append(count)
+            pos += size
+
+        self._codes = codes
+        self._offsets = offsets
+        self._sizes = sizes
+        self._sdna_indexes = sdna_indexes
+        self._counts = counts
+
+    @staticmethod
+    def _code_id(code) -> int:
+        """
+        Код блока как число. Двухбуквенные коды (SC, OB) дополнены нулями
+        """
+        return int.from_bytes(code.ljust(4, b'\0'), 'little')
+
+    def _get_block(self, i) -> tuple:
+        code = self._codes[i].to_bytes(4, 'little').split(b'\0', 1)[0]
+        return code, self._offsets[i], self._sizes[i], self._sdna_indexes[i], self._counts[i]
+
+    def iter_blocks(self) -> Iterator[tuple]:
+        """
+        Проходит по индексу блоков. Возвращает (код, смещение содержимого, размер, индекс SDNA, количество)
+        """
+        for i in range(len(self._codes)):
+            yield self._get_block(i)
+
+    def find_blocks(self, code) -> list:
+        """
+        Все блоки с кодом code. Поиск идёт по массиву кодов, заголовки заново не читаются
+        """
+        code_id = self._code_id(code)
+        codes = self._codes
+        blocks = []
+        i = -1
+        while True:
+            try:
+                i = codes.index(code_id, i + 1)
+            except ValueError:
+                return blocks
+            blocks.append(self._get_block(i))
+
+    def find_block(self, code) -> Optional[tuple]:
+        """
+        Первый блок с кодом code или None
+        """
+        try:
+            return self._get_block(self._codes.index(self._code_id(code)))
+        except ValueError:
+            return None
+
+    def _read_dna(self):
+        """
+        Разбирает SDNA: имена полей, типы, их размеры и структуры. Таблицы смещений полей строятся по запросу
+        """
+        block = self.find_block(b'DNA1')
+        if block is None:
+            raise ValueError('Блок DNA1 не найден')
+        _, offset, size, _, _ = block
+        data = bytes(self._buffer[offset:offset + size])
+        e = self._endian
+
+        if data[:8] != b'SDNANAME':
+            raise ValueError('Неверный заголовок SDNA')
+        pos = 8
+        self._names, pos = self._read_names(data, pos)
+
+        pos = (pos + 3) & ~3
+        if data[pos:pos + 4] != b'TYPE':
+            raise ValueError('Неверный заголовок SDNA TYPE')
+        self._types, pos = self._read_names(data, pos + 4)
+
+        pos = (pos + 3) & ~3
+        if data[pos:pos + 4] != b'TLEN':
+            raise ValueError('Неверный заголовок SDNA TLEN')
+        self._type_sizes = struct.unpack_from(f'{e}{len(self._types)}h', data, pos + 4)
+        pos += 4 + 2 * len(self._types)
+
+        pos = (pos + 3) & ~3
+        if data[pos:pos + 4] != b'STRC':
+            raise ValueError('Неверный заголовок SDNA STRC')
+        count, = struct.unpack_from(f'{e}i', data, pos + 4)
+        pos += 8
+
+        # Структуры: [(индекс типа, ((индекс типа поля, индекс имени поля), ...)), ...]
+        self._structs = []
+        # Имя типа -> индекс структуры
+        self._struct_by_type = {}
+        for i in range(count):
+            type_index, field_count = struct.unpack_from(f'{e}hh', data, pos)
+            fields = struct.unpack_from(f'{e}{2 * field_count}h', data, pos + 4)
+            pos += 4 + 4 * field_count
+            self._structs.append((type_index, fields))
+            self._struct_by_type[self._types[type_index]] = i
+
+        # Индекс структуры -> {имя поля: (смещение, тип, указатель ли, размерности)}
+        self._fields = {}
+
+    def _read_names(self, data, pos) -> tuple:
+        count, = struct.unpack_from(f'{self._endian}i', data, pos)
+        pos += 4
+        names = []
+        for _ in range(count):
+            end = data.index(b'\0', pos)
+            names.append(data[pos:end].decode('latin-1'))
+            pos = end + 1
+        return names, pos
+
+    def _get_fields(self, struct_index) -> dict:
+        """
+        Таблица полей структуры: {имя поля: (смещение, тип, указатель ли, размерности)}
+        """
+        fields = self._fields.get(struct_index)
+        if fields is not None:
+            return fields
+
+        fields = {}
+        offset = 0
+        _, members = self._structs[struct_index]
+        for i in range(0, len(members), 2):
+            type_name = self._types[members[i]]
+            name = self._names[members[i + 1]]
+            is_pointer = name.startswith('*') or name.startswith('(*')
+            dims = tuple(int(dim) for dim in _FIELD_DIMS_RE.findall(name))
+            size = self.pointer_size if is_pointer else self._type_sizes[members[i]]
+            for dim in dims:
+                size *= dim
+            fields[_FIELD_NAME_RE.search(name).group()] = (offset, type_name, is_pointer, dims)
+            offset += size
+
+        self._fields[struct_index] = fields
+        return fields
+
+    def get(self, block, path, default=_missing):
+        """
+        Значение поля блока. path -- имя поля или кортеж имён для вложенных структур, например (b'r', b'sfra').
+        Строки char[] возвращаются до первого \\0, массивы чисел -- списками.
+        Если поля нет, возвращается default, а если он не задан -- KeyError
+        """
+        if not isinstance(path, tuple):
+            path = (path,)
+
+        _, offset, size, struct_index, _ = block
+        for i, name in enumerate(path):
+            if isinstance(name, bytes):
+                name = name.decode()
+            field = self._get_fields(struct_index).get(name)
+            if field is None:
+                if default is _missing:
+                    raise KeyError(path)
+                return default
+            field_offset, type_name, is_pointer, dims = field
+            offset += field_offset
+
+            if i == len(path) - 1:
+                return self._read_value(offset, type_name, is_pointer, dims)
+            struct_index = self._struct_by_type.get(type_name)
+            if struct_index is None or is_pointer:
+                if default is _missing:
+                    raise KeyError(path)
+                return default
+
+    def _read_value(self, offset, type_name, is_pointer, dims):
+        buf = self._buffer
+        if is_pointer:
+            fmt = 'I' if self.pointer_size == 4 else 'Q'
+        else:
+            fmt = _TYPE_FORMATS.get(type_name)
+            if fmt is None:
+                # Вложенная структура целиком не читается
+                return None
+
+        count = 1
+        for dim in dims:
+            count *= dim
+
+        if type_name == 'char' and dims and not is_pointer:
+            data = bytes(buf[offset:offset + count])
+            return data.split(b'\0', 1)[0].decode(errors='replace')
+
+        values = struct.unpack_from(f'{self._endian}{count}{fmt}', buf, offset)
+        if not dims:
+            return values[0]
+        return list(values)
@@ -0,0 +1,15 @@
+import mmap
+
+
+def as_buffer(data):
+    """
+    Приводит bytes-like объект к буферу, у которого есть find, decode и срезы.
+    bytes, bytearray и mmap возвращаются как есть, memoryview на весь такой объект -- сам объект.
+    Только memoryview на часть объекта или на чужой буфер копируется
+    """
+    if not isinstance(data, memoryview):
+        return data
+    obj = data.obj
+    if data.c_contiguous and isinstance(obj, (bytes, bytearray, mmap.mmap)) and data.nbytes == len(obj):
+        return obj
+    return data.tobytes()
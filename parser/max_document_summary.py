@@ -14,66 +14,56 @@ class MaxDocumentSummaryParser:
     _result = dict()
 
     def __init__(self, stream):
+        """
+        stream -- поток или уже прочитанное содержимое (bytes, memoryview). Поток небольшой, читаем его целиком
+        """
         self._result = dict()
 
-        # Считываем заголовок
-        self._header = stream.read(200)
-
-        # Находим в нём разделитель
-        pos = self._header.find(b'\x1E\x00\x00\x00')
+        if isinstance(stream, (bytes, bytearray, memoryview)):
+            data = bytes(stream)
+        else:
+            data = stream.read()
 
-        # Разделитель обязательно должен быть выровнен по четному байту
+        # Находим разделитель. Он обязательно должен быть выровнен по четному байту
         # Если это не так, то нам попались данные
-        while pos % 2 != 0:
-            pos = self._header.find(b'\x1E\x00\x00\x00', pos+1)
+        pos = data.find(b'\x1E\x00\x00\x00')
+        while pos != -1 and pos % 2 != 0:
+            pos = data.find(b'\x1E\x00\x00\x00', pos + 1)
+        if pos == -1:
+            raise ValueError('Разделитель групп не найден')
 
-        # Переходим к разделителю
-        stream.seek(pos)
+        # Храним заголовок, вдруг потребуется
+        self._header = data[:pos]
 
         # Считываем разделитель
-        buf = stream.read(4)
-        delimiter, = struct.unpack('<I', buf)
+        delimiter, = struct.unpack_from('<I', data, pos)
+        pos += 4
 
         # Начинаем вести суммарное кол-во детей
         total_children = 0
 
         # Пока нам нам встречается правильный разделитель мы читаем названия групп
         while delimiter == 0x1e:
-            # Считываем длину строки
-            buf = stream.read(4)
-            length, = struct.unpack('<I', buf)
-
-            # Добавляем выравнивание
-            length += (4 -(stream.tell() + length) % 4) % 4
-
-            # Готовим формат строка
-            fmt = f'<{length}s'
-            # Считываем
-            buf = stream.read(length)
-            name, = struct.unpack(fmt, buf)
-
-            # Имя может содержать символы \0 в конце для выравнивания. Удаляем их
-            # А может быть в UTF-16. Мы ожидаем в этом блоке латиницу, так что просто удаляем все \0
-            name = name.replace(b'\x00', b'').decode(errors='backslashreplace')
+            name, pos = self._read_string(data, pos)
 
             # Если строка пуста, то флагов и количества детей не будет
             if len(name) == 0:
                 # Считываем разделитель
-                buf = stream.read(4)
-                delimiter, = struct.unpack('<I', buf)
+                delimiter, = struct.unpack_from('<I', data, pos)
+                pos += 4
                 continue
 
             # Считываем флаги
-            buf = stream.read(4)
-            flags, = struct.unpack('<I', buf)
+            flags, = struct.unpack_from('<I', data, pos)
+            pos += 4
 
             if flags == 0x1e:
                 delimiter = flags
                 continue
 
-            # Считываем количество детей
-            buf = stream.read(4 + 4)
-            count, delimiter = struct.unpack('<II', buf)
+            # Считываем количество детей и следующий разделитель
+            count, delimiter = struct.unpack_from('<II', data, pos)
+            pos += 8
 
             if flags != 0x03:
                 count = 0
@@ -93,8 +83,8 @@ class MaxDocumentSummaryParser:
             raise ValueError(f'Неверный разделитель: {delimiter:08X}')
 
         # Считываем суммарное количество детей
-        buf = stream.read(4)
-        children_count, = struct.unpack('<I', buf)
+        children_count, = struct.unpack_from('<I', data, pos)
+        pos += 4
 
         # Проверяем, что не просчитались
         if children_count != total_children:
@@ -102,22 +92,29 @@ class MaxDocumentSummaryParser:
 
         # Проходим по всем группам и читаем детей
         for name in self._result:
+            items = self._result[name]['items']
             for i in range(self._result[name]['count']):
-                # Считываем длину строки
-                buf = stream.read(4)
-                length, = struct.unpack('<I', buf)
-                # Добавляем выравнивание
-                length += (4 - (stream.tell() + length) % 4) % 4
-                # Считываем строку
-                buf = stream.read(length)
-                # Зачищаем строку
-                buf = buf.replace(b'\x00', b'').decode(errors='backslashreplace')
-
-                self._result[name]['items'].append(buf)
+                item, pos = self._read_string(data, pos)
+                items.append(item)
 
         # Делаем секцию Render Data красивой
         self._make_render_data_pretty()
 
+    @staticmethod
+    def _read_string(data, pos) -> tuple:
+        """
+        Читает строку с длиной и выравниванием по 4 байта от начала потока. Возвращает (строка, новая позиция)
+        """
+        length, = struct.unpack_from('<I', data, pos)
+        pos += 4
+        # Добавляем выравнивание
+        length += (4 - (pos + length) % 4) % 4
+
+        # Строка может содержать символы \0 в конце для выравнивания. Удаляем их
+        # А может быть в UTF-16. Мы ожидаем латиницу, так что просто удаляем все \0
+        string = data[pos:pos + length].replace(b'\x00', b'').decode(errors='backslashreplace')
+        return string, pos + length
+
     def _get_general_section(self) -> Optional[dict]:
         names = [
             'General',
@@ -1,4 +1,31 @@
-from typing import TextIO
+import re
+from typing import Iterator, Optional, TextIO
+
+
+# Один аргумент: обычные символы, экранированные символы и строки в кавычках до неэкранированного пробела
+_ARG_RE = re.compile(r'(?:[^ "\\]+|\\.|\\$|"(?:[^"\\]+|\\.|\\$)*(?:"|$))*', re.S)
+
+# Кавычки, которые нужно удалить из аргумента. Экранированные символы сохраняются как есть
+_QUOTE_RE = re.compile(r'(\\.)|"', re.S)
+
+# Сколько символов читаем из потока за раз
+_BLOCK_SIZE = 1 << 20
+
+# Сколько символов должно быть в буфере в начале команды, чтобы распознать комментарий и имя команды
+_LOOKAHEAD = 4096
+
+# Пробелы между командами
+_SPACE_RE = re.compile(r'\s*')
+
+# Имя команды
+_COMMAND_RE = re.compile(r'[^\s;]*')
+
+# Символы, важные для поиска конца команды вне кавычек и внутри них
+_STATEMENT_RE = re.compile(r'[;"\\]')
+_QUOTED_RE = re.compile(r'["\\]')
+
+# Перенос строки вместе с отступами вокруг него
+_NEWLINE_RE = re.compile(r'[ \t]*\r?\n\s*')
 
 
 class MayaASCIIParser:
@@ -18,6 +45,9 @@ class MayaASCIIParser:
     # Некоторые команды учитывают "контекст". Для них будем хранить информацию о последней ноде
     _previous_node = None
 
+    # Запрошены ли какие-нибудь атрибуты последней ноды
+    _previous_node_requested = False
+
     # Регистрируем обработчики известных комманд
     _handlers: dict
 
@@ -27,6 +57,12 @@ class MayaASCIIParser:
     # Словарь сопоставлений
     _requested: dict
 
+    # Ещё не найденные скалярные ключи в режиме first_match. None, если режим выключен
+    _unresolved: Optional[set] = None
+
+    # Можно ли прекратить чтение, как только _unresolved опустеет
+    _stop_early = False
+
     def _parse_type(self, value):
         """
         Приводит к правильному типу
@@ -68,41 +104,51 @@ class MayaASCIIParser:
             # Добавляем
             self._result[key].append(self._parse_type(value))
         else:
+            if self._unresolved is not None:
+                # В режиме first_match оставляем первое найденное значение
+                if key not in self._unresolved:
+                    return
+                self._unresolved.discard(key)
             # Не является, перезаписываем
             self._result[key] = self._parse_type(value)
 
-    def _parse_args(self, args: str) -> list:
+    def _is_done(self) -> bool:
         """
-        Разбирает строку на аргументы.
+        В режиме first_match проверяет, что все скалярные ключи найдены и массивов не запрошено
         """
-        result = []
+        return self._stop_early and not self._unresolved
 
-        i = 0
-        separator = ' '
-        arg = ''
-        while i < len(args):
-            if args[i] == ' ':
-                if separator == ' ':
-                    result.append(arg)
-                    arg = ''
-                else:
-                    arg += args[i]
-            elif args[i] == '"':
-                if separator == '"':
-                    separator = ' '
-                else:
-                    separator = '"'
-            elif args[i] == '\\':
-                arg += args[i]
-                i += 1
-                arg += args[i]
-            else:
-                arg += args[i]
+    def _parse_args(self, args: str, limit: Optional[int] = None) -> list:
+        """
+        Разбирает строку на аргументы.
+        Если задан limit, то разбираются только первые limit аргументов
+        """
+        # Без кавычек и экранирования аргументы просто разделены пробелами
+        if '"' not in args and '\\' not in args:
+            if limit is None:
+                return args.split(' ')
+            return args.split(' ', limit)[:limit]
 
-            i += 1
-        result.append(arg)
+        result = []
+        pos = 0
+        while limit is None or len(result) < limit:
+            m = _ARG_RE.match(args, pos)
+            arg = m.group()
+            if '"' in arg:
+                arg = _QUOTE_RE.sub(self._unquote, arg)
+            result.append(arg)
+            pos = m.end() + 1
+            if pos > len(args):
+                break
         return result
 
+    @staticmethod
+    def _unquote(m) -> str:
+        """
+        Оставляет экранированный символ и удаляет кавычку
+        """
+        return m.group(1) or ''
+
     def _on_requires(self, args):
         a = self._parse_args(args)
         # Исключаем подключение модуля maya
@@ -120,8 +166,10 @@ class MayaASCIIParser:
         self._add_to_result(f'fileInfo/{a[-2]}', a[-1])
 
     def _on_create_node(self, args):
-        a = self._parse_args(args)
+        # Остальные аргументы нужны только для камер
+        a = self._parse_args(args, 1)
         if a[0] == 'camera':
+            a = self._parse_args(args)
             i = 0
             name = ''
             while i < len(a):
@@ -133,14 +181,19 @@ class MayaASCIIParser:
             self._previous_node = None
         else:
             self._previous_node = None
+        self._previous_node_requested = False
 
     def _on_set_attr(self, args):
         if self._previous_node is None:
             return
         if self._previous_node.startswith('select/'):
+            # Сначала разбираем только имя атрибута: значения могут быть огромными массивами
+            path = f'{self._previous_node}{self._parse_args(args, 1)[0]}'
+            if path not in self._requested:
+                return
             a = self._parse_args(args)
             # FIXME: Не для всех типов подходит такая выборка. Однако, пока норм.
-            self._add_to_result(f'{self._previous_node}{a[0]}', a[-1])
+            self._add_to_result(path, a[-1])
 
     def _on_select(self, args):
         a = self._parse_args(args)
@@ -152,57 +205,140 @@ class MayaASCIIParser:
             i += 1
 
         self._previous_node = f'select/{name}'
+        self._previous_node_requested = any(path.startswith(self._previous_node) for path in self._requested)
+
+    def _is_interesting(self, cmd) -> bool:
+        """
+        Проверяет, нужно ли разбирать команду. Остальные команды пропускаются целиком
+        """
+        if cmd not in self._handlers:
+            return False
+        if cmd == 'setAttr':
+            # setAttr нужен только для нод, атрибуты которых запрошены
+            return self._previous_node_requested
+        return True
 
     def _on_comment(self, string):
         pass
 
-    def parse(self, requested: dict):
+    def _iter_statements(self) -> Iterator[tuple]:
+        """
+        Читает поток большими блоками и возвращает (команда, аргументы) для каждой нужной команды.
+        Конец команды -- ';' вне кавычек. Ненужные команды пропускаются без сборки строки.
+        Переносы строк внутри команды заменяются одним пробелом
+        """
+        buf = ''
+        pos = 0
+        eof = False
+
+        while True:
+            # Дочитываем, чтобы в начале команды было видно комментарий и имя команды целиком
+            while len(buf) - pos < _LOOKAHEAD and not eof:
+                block = self._stream.read(_BLOCK_SIZE)
+                eof = len(block) == 0
+                buf = buf[pos:] + block
+                pos = 0
+
+            pos = _SPACE_RE.match(buf, pos).end()
+            if pos == len(buf):
+                if eof:
+                    # Больше считывать нечего
+                    return
+                continue
+
+            if buf.startswith('//', pos):
+                # Комментарий до конца строки
+                end = buf.find('\n', pos)
+                while end == -1 and not eof:
+                    buf = self._stream.read(_BLOCK_SIZE)
+                    eof = len(buf) == 0
+                    pos = 0
+                    end = buf.find('\n')
+                if end == -1:
+                    return
+                self._on_comment(buf[pos:end])
+                pos = end + 1
+                continue
+
+            # Нам встретилась команда
+            m = _COMMAND_RE.match(buf, pos)
+            cmd = m.group()
+            collect = self._is_interesting(cmd)
+            start = pos = m.end()
+
+            # Ищем ';' вне кавычек. Если команда не нужна, то ничего не собираем
+            parts = []
+            quoted = False
+            while True:
+                m = (_QUOTED_RE if quoted else _STATEMENT_RE).search(buf, pos)
+                if m is not None:
+                    c = m.group()
+                    pos = m.end()
+                    if c == ';':
+                        break
+                    if c == '"':
+                        quoted = not quoted
+                        continue
+                    if pos < len(buf):
+                        # Пропускаем экранированный символ
+                        pos += 1
+                        continue
+                    # Экранированный символ в следующем блоке
+                    skip = 1
+                else:
+                    skip = 0
+
+                # Команда продолжается в следующем блоке
+                if collect:
+                    parts.append(buf[start:])
+                buf = self._stream.read(_BLOCK_SIZE)
+                if len(buf) == 0:
+                    # Файл закончился раньше, чем пришла точка с запятой.
+                    # Считаем эту команду битой и не пытаемся парсить
+                    return
+                start = 0
+                pos = skip
+
+            if not collect:
+                continue
+
+            parts.append(buf[start:pos - 1])
+            args = ''.join(parts)
+            if '\n' in args:
+                args = _NEWLINE_RE.sub(' ', args)
+            yield cmd, args.lstrip()
+
+    def parse(self, requested: dict, first_match: bool = False):
+        """
+        Разбирает файл по командам.
+        Если first_match, то скалярные значения не перезаписываются, а чтение прекращается,
+        как только все они найдены (если не запрошено ни одного массива)
+        """
         self._result = {}
 
         self._requested = requested
 
         # Инициализируем пустые массивы
+        has_arrays = False
         for key in self._requested:
             value = self._requested[key]
             if value.endswith('[]'):
                 value = value[:-2]
                 self._result[value] = []
-        # Считываем по командам
-        while True:
-            line = self._stream.readline()
+                has_arrays = True
 
-            if not line:
-                # Больше считывать нечего
-                return self._result
+        self._unresolved = None
+        if first_match:
+            self._unresolved = {value for value in self._requested.values() if not value.endswith('[]')}
+        self._stop_early = first_match and not has_arrays
 
-            if line.startswith('//'):
-                # Комментарий
-                self._on_comment(line)
-                continue
-
-            # Нам встретилась команда. Затираем перенос строки
-            line = line.lstrip().rstrip('\r\n')
-            # И считываем её до тех пор, пока не встретим ';'
-            while line[-1] != ';':
-                data = self._stream.readline()
-                # Если файл закончился раньше, чем пришла точка с запятой
-                # То считаем эту строчку битой и не пытаемся парсить
-                if len(data) == 0:
-                    break
-                line += data.lstrip().rstrip('\r\n')
-
-            # Проверяем, что строка корректна
-            if line[-1] != ';':
-                # Иначе возвращаемся в начало
-                continue
-            # И в конце затираем ;
-            line = line[:-1]
-
-            # Разбиваем на команду и аргументы
-            cmd, args = line.split(' ', 1)
-
-            # Проверяем, есть ли обработчик на такую команду
-            if cmd in self._handlers:
-                self._handlers[cmd](args)
+        self._previous_node = None
+        self._previous_node_requested = False
 
+        # Считываем по командам
+        for cmd, args in self._iter_statements():
+            self._handlers[cmd](args)
+            if self._is_done():
+                break
 
+        return self._result
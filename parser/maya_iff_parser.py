@@ -1,11 +1,93 @@
 import io
+import mmap
+import os
 import struct
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Iterator, Optional
 
 from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser.parser.buffer import as_buffer
 from scene_parser import print_debug
 
 
+# Кэш индексов списков: (путь к файлу, размер, mtime) -> {путь списка: [(смещение, размер), ...]}
+_index_cache = {}
+
+# Сколько индексов держим в кэше
+_INDEX_CACHE_SIZE = 64
+
+
+class MayaIFFQuery:
+    """
+    Скомпилированные запрошенные пути: префиксное дерево по сегментам пути.
+    Компилируется один раз и может переиспользоваться для разных файлов
+    """
+
+    # Корень дерева. Узел -- словарь {сегмент: узел}, в ключе None лежит (куда маппим, массив ли)
+    root: dict
+
+    # Исходный словарь сопоставлений
+    requested: dict
+
+    def __init__(self, requested: dict):
+        self.requested = requested
+        self.root = {}
+        for path, key in requested.items():
+            node = self.root
+            for segment in path.split('/')[1:]:
+                node = node.setdefault(segment, {})
+            if key.endswith('[]'):
+                node[None] = (key[:-2], True)
+            else:
+                node[None] = (key, False)
+
+    def get_arrays(self) -> list:
+        """
+        Возвращает ключи результата, которые являются массивами
+        """
+        return [key[:-2] for key in self.requested.values() if key.endswith('[]')]
+
+    def get_scalars(self) -> set:
+        """
+        Возвращает ключи результата, которые не являются массивами
+        """
+        return {key for key in self.requested.values() if not key.endswith('[]')}
+
+    @staticmethod
+    def get_target(node: dict, key: str) -> Optional[tuple]:
+        """
+        Возвращает (куда маппим, массив ли) для key под узлом node или None, если он не запрошен
+        """
+        node = node.get(key)
+        if node is None:
+            return None
+        return node.get(None)
+
+    def find(self, path: tuple) -> Optional[dict]:
+        """
+        Возвращает узел дерева по пути списка или None, если под ним ничего не запрошено
+        """
+        node = self.root
+        for segment in path:
+            node = node.get(segment)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def has_values(node: dict) -> bool:
+        """
+        Запрошены ли значения непосредственно в списке, соответствующем узлу
+        """
+        return any(segment is not None and None in child for segment, child in node.items())
+
+    @staticmethod
+    def has_children(node: dict) -> bool:
+        """
+        Есть ли под узлом запрошенные пути
+        """
+        return len(node) > 1 or None not in node
+
+
 class MayaIFFParser:
     """
     Парсер 32-х битных и 64-х битных IIF файлов
@@ -18,11 +100,26 @@ class MayaIFFParser:
     _result: dict
 
     # По каким путям ищем
-    _requested: dict
+    _query: MayaIFFQuery
+
+    # Ещё не найденные скалярные ключи в режиме first_match. None, если режим выключен
+    _unresolved: Optional[set] = None
+
+    # Можно ли прекратить чтение, как только _unresolved опустеет
+    _stop_early: bool = False
 
     # Размер адрес в байтах
     _ptr_size: int
 
+    # Отображённый в память файл или переданное содержимое. Если задан, чанки читаются из него по смещениям, без read()
+    _buffer = None
+
+    # Текущее смещение в _buffer
+    _pos: int = 0
+
+    # Отображение создано здесь (use_mmap), а не передано вызывающим, и закрывается в close
+    _owns_buffer = False
+
     # Идентификаторы чанков, которые являются списками
     _list_chunks = [
         b'FOR4',
@@ -30,13 +127,24 @@ class MayaIFFParser:
         b'SLCT'
     ]
 
-    def __init__(self, stream: BinaryIO):
+    def __init__(self, stream: BinaryIO, use_mmap: bool = False):
         """
-        Конструктор. Принимается rb-поток
+        Конструктор. Принимается rb-поток или содержимое файла (bytes, bytearray, memoryview).
+        Если use_mmap, то файл отображается в память и заголовки и значения чанков
+        разбираются на месте, копируются только нужные значения. Содержимое в памяти всегда разбирается на месте
         """
         self._stream = stream
+        self._buffer = None
+        self._pos = 0
+        if isinstance(stream, (bytes, bytearray, memoryview)):
+            self._buffer = as_buffer(stream)
+        elif use_mmap:
+            self._buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            self._owns_buffer = True
+
         # Проверяем магию
-        buf = self._stream.read(4)
+        buf, start, end = self._read(4)
+        buf = buf[start:end]
         if buf == b'FOR4':
             self._ptr_size = 4
             print_debug('Найден 32-х битный файл')
@@ -44,47 +152,111 @@ class MayaIFFParser:
             self._ptr_size = 8
             print_debug('Найден 64-х битный файл')
         else:
+            self.close()
             raise InvalidMagicException
 
         # Возвращаем на ноль
-        self._stream.seek(0)
+        self._seek(0)
 
-    def _add_to_result(self, prefix, key, value) -> None:
+    def close(self) -> None:
         """
-        Добавляет в _result значение, если prefix/key указан в requested
+        Освобождает отображение файла, если оно было создано
         """
-        # Добываем полный путь
-        path = f'{prefix}/{key}'
-        # Проверяем, есть ли он в requested
-        if not path in self._requested:
-            return
-        # Достаём на что маппим
-        key = self._requested[path]
+        if self._owns_buffer and isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+
+    def _add_to_result(self, target, value) -> None:
+        """
+        Добавляет в _result значение. target -- (куда маппим, массив ли) из MayaIFFQuery
+        """
+        key, is_array = target
         # проверяем, не является ли оно массивом
-        if key.endswith('[]'):
-            # Является. Отрезаем скобки
-            key = key[:-2]
-            # Создаём запись в result, если необходимо
+        if is_array:
+            # Является. Создаём запись в result, если необходимо
             if not key in self._result:
                 self._result[key] = []
             # Добавляем
             self._result[key].append(value)
         else:
+            if self._unresolved is not None:
+                # В режиме first_match оставляем первое найденное значение
+                if key not in self._unresolved:
+                    return
+                self._unresolved.discard(key)
             # Не является, перезаписываем
             self._result[key] = value
 
+    def _is_done(self) -> bool:
+        """
+        В режиме first_match проверяет, что все скалярные ключи найдены и массивов не запрошено
+        """
+        return self._stop_early and not self._unresolved
+
+    def _read(self, size) -> tuple:
+        """
+        Считывает size байт, возвращает (buf, start, end).
+        В режиме mmap данные не копируются, а возвращаются границы внутри _buffer
+        """
+        if self._buffer is None:
+            buf = self._stream.read(size)
+            return buf, 0, len(buf)
+        start = self._pos
+        self._pos = min(start + size, len(self._buffer))
+        return self._buffer, start, self._pos
+
+    def _skip(self, size) -> None:
+        """
+        Пропускает size байт
+        """
+        if self._buffer is None:
+            self._stream.seek(size, 1)
+        else:
+            self._pos += size
+
+    def _tell(self) -> int:
+        """
+        Возвращает текущее смещение
+        """
+        if self._buffer is None:
+            return self._stream.tell()
+        return self._pos
+
+    def _seek(self, pos) -> None:
+        """
+        Переходит на абсолютное смещение pos
+        """
+        if self._buffer is None:
+            self._stream.seek(pos)
+        else:
+            self._pos = pos
+
     def _read_header(self) -> tuple:
         """
         Считывает заголовок, возвращает (chunk_id, flags, size)
         """
+        if self._buffer is not None:
+            pos = self._pos
+            if self._ptr_size == 8:
+                if pos + 16 > len(self._buffer):
+                    return None, None, None
+                self._pos += 16
+                return struct.unpack_from(">4sLQ", self._buffer, pos)
+            if pos + 8 > len(self._buffer):
+                return None, None, None
+            self._pos += 8
+            chunk_id, size = struct.unpack_from(">4sL", self._buffer, pos)
+            return chunk_id, 0, size
+
+        # Неполный заголовок в конце обрезанного файла считаем концом файла, как и в режиме mmap
         if self._ptr_size == 8:
             buf = self._stream.read(16)
-            if len(buf) == 0:
+            if len(buf) < 16:
                 return None, None, None
             return struct.unpack(">4sLQ", buf)
         else:
             buf = self._stream.read(8)
-            if len(buf) == 0:
+            if len(buf) < 8:
                 return None, None, None
             chunk_id, size = struct.unpack(">4sL", buf)
             return chunk_id, 0, size
@@ -94,129 +266,346 @@ class MayaIFFParser:
         Выравнивает по длине указателя. Возвращает насколько байт выровнял
         """
         align = (self._ptr_size - (size % self._ptr_size)) % self._ptr_size
-        self._stream.seek(align, 1)
+        self._skip(align)
         return align
 
     def _read_slct(self) -> Optional[str]:
         """
-        Читает чанк SLCT
+        Читает чанк SLCT. Возвращает None, если файл закончился
         """
         id, flags, size = self._read_header()
-        return self._stream.read(size).decode(errors='backslashreplace')
+        if id is None:
+            return None
+        buf, start, end = self._read(size)
+        return buf[start:end].decode(errors='backslashreplace')
 
-    def _read_chunk(self, prefix='') -> int:
+    def _read_list_name(self) -> tuple:
         """
-        Рекурсивно читает чанки.
-        Возвращает число прочитанных байт
+        Считывает имя списка. Возвращает (имя, сколько байт содержимого списка уже прочитано)
         """
-        chunk_id, flags, size = self._read_header()
+        buf, start, end = self._read(4)
+        # декодируем
+        name = buf[start:end].decode(errors='backslashreplace')
 
-        if chunk_id is None:
-            return -1
+        # Имя входит в длину содержимого списка
+        children_size = 4
 
-        if chunk_id in self._list_chunks:
-            # Это список чанков
-            # Считываем имя
-            name = self._stream.read(4)
-            # декодируем
-            name = name.decode(errors='backslashreplace')
-
-            # Имя входит в длину содержимого списка
-            children_size = 4
-
-            # Если имя SLCT, то первый чанк обязателельно типа SLCT с длинным названием списка
-            if name == 'SLCT':
-                name = self._read_slct()
-                l = len(name)
-                align = self._align(l)
-                children_size += 16 + l + align
-
-            # Проверяем, можем ли мы пропустить этот список
-            list_path = f'{prefix}/{name}'
-            skip = True
-            for key in self._requested:
-                if key.startswith(list_path):
-                    skip = False
-                    break
+        # Если имя SLCT, то первый чанк обязателельно типа SLCT с длинным названием списка
+        if name == 'SLCT':
+            name = self._read_slct()
+            if name is None:
+                # Файл обрезан, список будет пропущен
+                return None, children_size
+            l = len(name)
+            align = self._align(l)
+            children_size += 16 + l + align
 
-            if skip:
-                self._stream.seek(size - children_size, 1)
-                return 2 * self._ptr_size + 4 + size
+        return name, children_size
 
-            # Проходим по всем детям, выравнивая по размеру указателя
-            while children_size < size:
-                l = self._read_chunk(prefix + "/" + name)
-                # Последний массив не полный, прерываемся
-                if l == -1:
-                    break
-                align = self._align(l)
-                children_size += l + align
-            return 2*self._ptr_size + 4 + size
-        elif chunk_id == b'DBLE':
+    def _read_value(self, chunk_id, size, node: Optional[dict] = None) -> tuple:
+        """
+        Читает чанк со значением. Возвращает (key, target, value) или (None, None, None), если значения нет.
+        Если передан node, то сначала декодируется только ключ и по нему ищется target в node:
+        значение декодируется и копируется, только если оно запрошено. Без node возвращаются все значения, target -- None
+        """
+        if chunk_id == b'DBLE':
             # Чанк со значением с плавающей запятой
-            buf = self._stream.read(size)
+            buf, start, end = self._read(size)
             # Находим ноль-символ
-            pos = buf.find(b'\x00')
-            # Разбираем
-            if len(buf) - pos - 2 == 8:
+            pos = buf.find(b'\x00', start, end)
+            if pos == -1:
+                pos = end - 1
+            if end - pos - 2 == 8:
                 # double, 8 байт
-                key, value = struct.unpack(f'>{pos}sxxd', buf)
-            elif len(buf) - pos - 2 == 4:
+                fmt = '>d'
+            elif end - pos - 2 == 4:
                 # float, 4 байта
-                key, value = struct.unpack(f'>{pos}sxxf', buf)
+                fmt = '>f'
             else:
                 # Неизвестно
-                return 2 * self._ptr_size + size
+                return None, None, None
 
-            key = key.decode(errors='backslashreplace')
-            self._add_to_result(prefix, key, value)
+            key = buf[start:pos].decode(errors='backslashreplace')
+            target = None
+            if node is not None:
+                target = MayaIFFQuery.get_target(node, key)
+                if target is None:
+                    return None, None, None
+            value, = struct.unpack_from(fmt, buf, pos + 2)
+            return key, target, value
         elif chunk_id == b'STR ' or chunk_id == b'FINF':
             # Строковый чанк
-            buf = self._stream.read(size)
-            p = buf.find(b'\0')
-            key = buf[:p].decode(errors='backslashreplace')
+            buf, start, end = self._read(size)
+            p = buf.find(b'\0', start, end)
+            if p == -1:
+                p = end - 1
+            key = buf[start:p].decode(errors='backslashreplace')
+            target = None
+            if node is not None:
+                target = MayaIFFQuery.get_target(node, key)
+                if target is None:
+                    return None, None, None
             offset = 1
             if chunk_id == b'STR ':
                 # У STR есть лишний байт после \0, а у FINF -- нет
                 offset = 2
 
-            value = buf[p + offset:-1].decode(errors='backslashreplace')
-
-            self._add_to_result(prefix, key, value)
-        elif chunk_id == b'PLUG':
-            # Чанк описания плагинов
-            buf = self._stream.read(size)
-            data = [x.strip(b'\x00').decode(errors='backslashreplace') for x in buf.split(b'\x00')]
-            value = {
-                'name': data[0],
-                'version': data[1]
-            }
-
-            self._add_to_result(prefix, chunk_id.decode(), value)
-        elif chunk_id == b'CREA':
-            buf = self._stream.read(size)
+            value = buf[p + offset:end - 1].decode(errors='backslashreplace')
+            return key, target, value
+        elif chunk_id == b'PLUG' or chunk_id == b'CREA':
+            # Ключ -- сам идентификатор чанка, так что незапрошенный чанк можно пропустить не читая
+            key = chunk_id.decode()
+            target = None
+            if node is not None:
+                target = MayaIFFQuery.get_target(node, key)
+                if target is None:
+                    self._skip(size)
+                    return None, None, None
+            buf, start, end = self._read(size)
+            buf = buf[start:end]
+            if chunk_id == b'PLUG':
+                # Чанк описания плагинов
+                data = [x.strip(b'\x00').decode(errors='backslashreplace') for x in buf.split(b'\x00')]
+                value = {
+                    'name': data[0],
+                    'version': data[1]
+                }
+                return key, target, value
             try:
                 name = buf.split(b'\x00')[1].decode(errors='backslashreplace')
-                self._add_to_result(prefix, chunk_id.decode(), name)
+                return key, target, name
             except IndexError:
                 pass
         else:
             # Неизвестный чанк, пропускаем
-            self._stream.seek(size, 1)
-        return 2*self._ptr_size + size
+            self._skip(size)
+        return None, None, None
+
+    def _read_chunk(self, node) -> int:
+        """
+        Рекурсивно читает чанки. node -- узел дерева запроса, соответствующий текущему списку.
+        Возвращает число прочитанных байт
+        """
+        chunk_id, flags, size = self._read_header()
+
+        if chunk_id is None:
+            return -1
+
+        if chunk_id not in self._list_chunks:
+            key, target, value = self._read_value(chunk_id, size, node)
+            if key is not None:
+                self._add_to_result(target, value)
+            return 2 * self._ptr_size + size
+
+        # Это список чанков
+        name, children_size = self._read_list_name()
+
+        # Проверяем, можем ли мы пропустить этот список
+        child = node.get(name)
+
+        if child is None or not MayaIFFQuery.has_children(child):
+            self._skip(size - children_size)
+            return 2 * self._ptr_size + 4 + size
+
+        # Проходим по всем детям, выравнивая по размеру указателя
+        while children_size < size:
+            l = self._read_chunk(child)
+            # Последний массив не полный или всё уже найдено, прерываемся
+            if l == -1 or self._is_done():
+                break
+            align = self._align(l)
+            children_size += l + align
+        return 2*self._ptr_size + 4 + size
+
+    def _walk(self, node: Optional[dict], path: tuple = (), index: Optional[dict] = None,
+              with_path: bool = True) -> Iterator[tuple]:
+        """
+        Итеративно читает чанки с явным стеком открытых списков.
+        Обходит файл так же, как _read_chunk, но без рекурсии.
+        Если node -- узел MayaIFFQuery, то возвращает (путь, target, key, value) только для запрошенных значений.
+        Если node is None, то обходит все списки и возвращает (путь, None, key, value) для всех значений.
+        path -- путь списка, в котором лежит первый чанк.
+        Если передан index, то значения не читаются, а в index записываются смещения и размеры всех списков.
+        Если не with_path, то вместо пути возвращается None: путь не собирается
+        """
+        # Открытые списки: [сколько байт содержимого прочитано, размер содержимого, узел родителя]
+        stack = []
+        # Имена открытых списков. Кортеж пути собирается из них, только когда он нужен, и кэшируется до входа в список или выхода из него
+        names = []
+        current = path if with_path else None
+
+        while True:
+            offset = self._tell() if index is not None else 0
+            chunk_id, flags, size = self._read_header()
 
-    def parse(self, requested: dict) -> dict:
+            if chunk_id is None:
+                l = -1
+            elif chunk_id in self._list_chunks:
+                # Это список чанков
+                name, children_size = self._read_list_name()
+                if index is not None:
+                    index.setdefault(path + tuple(names) + (name,), []).append((offset, size))
+                if node is None:
+                    child = None
+                    skip = False
+                else:
+                    child = node.get(name)
+                    skip = child is None or not MayaIFFQuery.has_children(child)
+
+                if skip:
+                    # Пропускаем список целиком
+                    self._skip(size - children_size)
+                elif children_size < size:
+                    # Спускаемся в список
+                    stack.append([children_size, size, node])
+                    names.append(name)
+                    node = child
+                    current = None
+                    continue
+                l = 2 * self._ptr_size + 4 + size
+            elif index is not None:
+                # Строим индекс, значения не нужны
+                self._skip(size)
+                l = 2 * self._ptr_size + size
+            else:
+                key, target, value = self._read_value(chunk_id, size, node)
+                if key is not None:
+                    if current is None and with_path:
+                        current = path + tuple(names)
+                    yield current, target, key, value
+                l = 2 * self._ptr_size + size
+
+            # Учитываем прочитанный чанк в родителях и закрываем законченные списки
+            while stack:
+                frame = stack[-1]
+                # Если последний массив не полный, родитель тоже заканчивается
+                if l != -1:
+                    align = self._align(l)
+                    frame[0] += l + align
+                    if frame[0] < frame[1]:
+                        break
+                stack.pop()
+                names.pop()
+                node = frame[2]
+                if with_path:
+                    current = None
+                l = 2 * self._ptr_size + 4 + frame[1]
+            else:
+                # Корневой список прочитан
+                return
+
+    def _get_index(self) -> Optional[dict]:
+        """
+        Возвращает индекс списков файла: {путь списка: [(смещение, размер), ...]}.
+        Индекс строится одним проходом и кэшируется по пути, размеру и времени изменения файла.
+        Если поток не связан с файлом или индекс построить не удалось (например, файл повреждён), возвращает None
+        """
+        try:
+            stat = os.fstat(self._stream.fileno())
+            key = (os.path.realpath(self._stream.name), stat.st_size, stat.st_mtime_ns)
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+        if key in _index_cache:
+            return _index_cache[key]
+
+        index = {}
+        self._seek(0)
+        try:
+            for _ in self._walk(None, index=index):
+                pass
+        except (struct.error, OSError, ValueError) as e:
+            # Индекс обходит все списки, в том числе те, что обычный обход пропускает. Читаем файл без индекса
+            print_debug(f'Не удалось построить индекс: {e}')
+            return None
+
+        if len(_index_cache) >= _INDEX_CACHE_SIZE:
+            _index_cache.pop(next(iter(_index_cache)))
+        _index_cache[key] = index
+        return index
+
+    def _walk_indexed(self, index: dict) -> Iterator[tuple]:
+        """
+        Обходит только списки из индекса, в которых лежат запрошенные значения, в порядке их следования в файле
+        """
+        # Выбираем списки с запрошенными значениями
+        selected = set()
+        for path in index:
+            node = self._query.find(path)
+            if node is not None and MayaIFFQuery.has_values(node):
+                selected.add(path)
+
+        # Списки, у которых выбран предок, будут прочитаны вместе с ним
+        starts = sorted(
+            (offset, path)
+            for path in selected
+            if not any(path[:i] in selected for i in range(1, len(path)))
+            for offset, _ in index[path]
+        )
+        for offset, path in starts:
+            self._seek(offset)
+            yield from self._walk(self._query.find(path[:-1]), path[:-1], with_path=False)
+
+    def iter_chunks(self) -> Iterator[tuple]:
+        """
+        Генератор по всем значениям файла по мере их чтения.
+        Возвращает (путь списка, key, value), путь в том же виде, что и в requested: /Maya/HEAD
+        """
+        self._seek(0)
+        for path, _, key, value in self._walk(None):
+            yield '/' + '/'.join(path), key, value
+
+    def iter_matches(self, requested) -> Iterator[tuple]:
+        """
+        Генератор по запрошенным значениям по мере их чтения. Можно прервать, как только найдено нужное.
+        requested -- словарь сопоставлений или скомпилированный MayaIFFQuery.
+        Возвращает (путь списка, key, value)
+        """
+        if not isinstance(requested, MayaIFFQuery):
+            requested = MayaIFFQuery(requested)
+        self._seek(0)
+        for path, _, key, value in self._walk(requested.root):
+            yield '/' + '/'.join(path), key, value
+
+    def parse(self, requested, recursive: bool = True, first_match: bool = False, use_index: bool = False) -> dict:
+        """
+        Разбирает файл. requested -- словарь сопоставлений или скомпилированный MayaIFFQuery.
+        Если recursive (по умолчанию), то используется рекурсивный обход, иначе итеративный: он не упирается
+        в предел рекурсии на очень глубоких файлах, но держит больше памяти (см. benchmarks/maya_iff.py).
+        Если first_match, то скалярные значения не перезаписываются, а чтение прекращается,
+        как только все они найдены (если не запрошено ни одного массива).
+        Если use_index, то по файлу строится (или берётся из кэша) индекс списков,
+        и читаются только списки с запрошенными значениями
+        """
         self._result = {}
-        self._requested = requested
+        if not isinstance(requested, MayaIFFQuery):
+            requested = MayaIFFQuery(requested)
+        self._query = requested
+        self._unresolved = self._query.get_scalars() if first_match else None
 
         # Инициализируем пустые массивы
-        for key in self._requested:
-            value = self._requested[key]
-            if value.endswith('[]'):
-                value = value[:-2]
-                self._result[value] = []
-
-        # Приступаем к чтению чанков
-        self._read_chunk()
+        arrays = self._query.get_arrays()
+        for key in arrays:
+            self._result[key] = []
+        self._stop_early = first_match and not arrays
+
+        if self._is_done():
+            return self._result
+
+        index = self._get_index() if use_index else None
+
+        # Приступаем к чтению чанков. С индексом списки читаются итеративным обходом
+        self._seek(0)
+        if recursive and index is None:
+            self._read_chunk(self._query.root)
+        else:
+            if index is not None:
+                chunks = self._walk_indexed(index)
+            else:
+                chunks = self._walk(self._query.root, with_path=False)
+            for _, target, _, value in chunks:
+                self._add_to_result(target, value)
+                if self._is_done():
+                    break
 
         return self._result
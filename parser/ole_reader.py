@@ -0,0 +1,206 @@
+import mmap
+import os
+import struct
+
+from scene_parser.parser.buffer import as_buffer
+
+
+class OleReader:
+    """
+    Читает отдельные потоки из OLE Compound File (CFB) без загрузки всей структуры.
+    Разбирается только заголовок, цепочка каталога и цепочка нужного потока; FAT читается по одному сектору по мере надобности
+    """
+
+    # Сигнатура OLE Compound File
+    _magic = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+    # Заголовок: версия, порядок байт, размеры секторов, число секторов каталога и FAT, начала цепочек, первые 109 записей DIFAT
+    _header = struct.Struct('<HHHHH6sIIIIIIIII109I')
+
+    # Запись каталога: имя, длина имени, тип, цвет, левый и правый соседи, ребёнок, clsid, флаги, даты, начальный сектор, размер
+    _entry = struct.Struct('<64sHBBIII16sI8s8sIQ')
+
+    # Конец цепочки и особые номера секторов
+    _end_of_chain = 0xFFFFFFFE
+    _max_sector = 0xFFFFFFFA
+
+    # Запись каталога отсутствует
+    _no_stream = 0xFFFFFFFF
+
+    # Буфер открыт здесь, а не передан вызывающим, и закрывается в close
+    _owns_buffer = False
+
+    def __init__(self, file):
+        """
+        file -- путь к файлу, открытый бинарный поток или содержимое файла (bytes, bytearray, memoryview)
+        """
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            self._buffer = as_buffer(file)
+        elif isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as f:
+                self._buffer = self._map(f)
+        else:
+            try:
+                self._buffer = self._map(file)
+            except (AttributeError, OSError, ValueError):
+                file.seek(0)
+                self._buffer = file.read()
+        self._owns_buffer = not isinstance(file, (bytes, bytearray, memoryview))
+
+        if len(self._buffer) < 512 or self._buffer[:8] != self._magic:
+            self.close()
+            raise OSError('not an OLE2 structured storage file')
+
+        (_, major, _, sector_shift, mini_sector_shift, _, _, _, self._first_dir, _, self._mini_cutoff,
+         self._first_mini_fat, _, self._first_difat, _, *difat) = self._header.unpack_from(self._buffer, 24)
+        if major not in (3, 4) or sector_shift not in (9, 12):
+            self.close()
+            raise OSError(f'incorrect OLE header: version {major}, sector shift {sector_shift}')
+
+        self._sector_size = 1 << sector_shift
+        self._mini_sector_size = 1 << mini_sector_shift
+        # Сколько номеров секторов помещается в один сектор
+        self._per_sector = self._sector_size // 4
+        # Секторы FAT; дополняются из цепочки DIFAT, когда первых 109 не хватает
+        self._difat = [sector for sector in difat if sector <= self._max_sector]
+        self._next_difat = self._first_difat
+        # Прочитанные секторы FAT: номер сектора FAT -> кортеж записей
+        self._fat = {}
+        # Верхняя граница длины цепочки, чтобы не зациклиться на повреждённом файле
+        self._sector_count = (len(self._buffer) - 1) // self._sector_size + 1
+
+        self._directory = self._read_chain(self._first_dir)
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._owns_buffer and isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+
+    def _read_numbers(self, sector) -> tuple:
+        """
+        Номера секторов, записанные в секторе sector (FAT или DIFAT)
+        """
+        offset = (sector + 1) * self._sector_size
+        if offset + self._sector_size > len(self._buffer):
+            raise OSError(f'sector {sector} is out of file')
+        return struct.unpack_from(f'<{self._per_sector}I', self._buffer, offset)
+
+    def _get_fat_sector(self, index) -> int:
+        """
+        Номер index-го сектора FAT. Цепочка DIFAT читается только до нужного места
+        """
+        while index >= len(self._difat):
+            if self._next_difat > self._max_sector:
+                raise OSError(f'FAT sector {index} is out of DIFAT')
+            sectors = self._read_numbers(self._next_difat)
+            self._difat.extend(sector for sector in sectors[:-1] if sector <= self._max_sector)
+            self._next_difat = sectors[-1]
+        return self._difat[index]
+
+    def _get_next(self, sector) -> int:
+        """
+        Следующий сектор цепочки по FAT
+        """
+        index = sector // self._per_sector
+        fat = self._fat.get(index)
+        if fat is None:
+            fat = self._fat[index] = self._read_numbers(self._get_fat_sector(index))
+        return fat[sector % self._per_sector]
+
+    def _get_chain(self, sector) -> list:
+        """
+        Номера секторов цепочки, начинающейся с sector
+        """
+        chain = []
+        while sector != self._end_of_chain:
+            if sector > self._max_sector or len(chain) > self._sector_count:
+                raise OSError(f'incorrect sector chain at sector {sector}')
+            chain.append(sector)
+            sector = self._get_next(sector)
+        return chain
+
+    def _read_chain(self, sector) -> bytes:
+        size = self._sector_size
+        return b''.join(self._buffer[(s + 1) * size:(s + 2) * size] for s in self._get_chain(sector))
+
+    def _read_mini_chain(self, sector, size, root) -> bytes:
+        """
+        Читает поток из mini stream по цепочке MiniFAT. Сам mini stream лежит в цепочке корня,
+        из неё берутся только нужные секторы
+        """
+        mini_fat = self._read_chain(self._first_mini_fat)
+        count = len(mini_fat) // 4
+        root_chain = self._get_chain(root[5])
+        mini_size = self._mini_sector_size
+        # Сколько мини-секторов в одном секторе
+        per_sector = self._sector_size // mini_size
+
+        parts = []
+        while len(parts) * mini_size < size:
+            if sector >= count or sector * mini_size >= root[6] or len(parts) > count:
+                raise OSError(f'incorrect mini sector chain at sector {sector}')
+            index, position = divmod(sector, per_sector)
+            if index >= len(root_chain):
+                raise OSError(f'mini sector {sector} is out of mini stream')
+            offset = (root_chain[index] + 1) * self._sector_size + position * mini_size
+            parts.append(self._buffer[offset:offset + mini_size])
+            sector, = struct.unpack_from('<I', mini_fat, sector * 4)
+        return b''.join(parts)[:size]
+
+    def _get_entry(self, sid) -> tuple:
+        """
+        Запись каталога: (имя, тип, левый сосед, правый сосед, ребёнок, начальный сектор, размер)
+        """
+        if (sid + 1) * self._entry.size > len(self._directory):
+            raise OSError(f'incorrect directory entry {sid}')
+        (raw_name, name_length, entry_type, _, left, right, child,
+         _, _, _, _, start, size) = self._entry.unpack_from(self._directory, sid * self._entry.size)
+        name = raw_name[:max(name_length - 2, 0)].decode('utf-16-le', errors='replace')
+        if self._sector_size == 512:
+            # В версии 3 старшие 32 бита размера не используются
+            size &= 0xFFFFFFFF
+        return name, entry_type, left, right, child, start, size
+
+    def _find(self, name) -> tuple:
+        """
+        Ищет поток name среди детей корня, без учёта регистра
+        """
+        root = self._get_entry(0)
+        name = name.lower()
+        stack = [root[4]]
+        visited = set()
+        while stack:
+            sid = stack.pop()
+            if sid == self._no_stream or sid in visited:
+                continue
+            visited.add(sid)
+            entry = self._get_entry(sid)
+            if entry[0].lower() == name:
+                return root, entry
+            stack.append(entry[2])
+            stack.append(entry[3])
+        raise OSError(f'stream not found: {name}')
+
+    def read_stream(self, name) -> bytes:
+        """
+        Возвращает содержимое потока name из корня файла
+        """
+        root, entry = self._find(name)
+        _, entry_type, _, _, _, start, size = entry
+        if entry_type != 2:
+            raise OSError(f'not a stream: {name}')
+
+        if size < self._mini_cutoff:
+            # Маленькие потоки лежат в mini stream
+            return self._read_mini_chain(start, size, root)
+
+        data = self._read_chain(start)
+        if len(data) < size:
+            raise OSError(f'incomplete stream: {name}')
+        return data[:size]
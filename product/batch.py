@@ -0,0 +1,127 @@
+"""
+Пакетный разбор сцен в пуле процессов.
+Результаты выдаются в формате JSON Lines по мере готовности.
+
+python -m scene_parser.product.batch [-j N] [-o out.jsonl] [-s] файл_или_каталог ...
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser.product.impl import get_supported_extensions
+from scene_parser.product.sniff import HEADER_SIZE, get_parser_by_content, sniff
+
+
+def _get_extension(path: str) -> str:
+    return os.path.splitext(path)[1][1:].lower()
+
+
+def _has_signature(path: Path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return sniff(f.read(HEADER_SIZE)) is not None
+    except OSError:
+        return False
+
+
+def iter_scene_files(paths: Iterable[str], sniff_content: bool = False) -> Iterator[str]:
+    """
+    Раскрывает каталоги в список файлов сцен. Файлы, переданные явно, возвращаются как есть.
+    По умолчанию из каталогов берутся только файлы с поддерживаемыми расширениями, остальные пропускаются.
+    Если sniff_content, то у остальных файлов каталога проверяются первые байты,
+    так что находятся и сцены с неверным расширением или без него
+    """
+    extensions = set(get_supported_extensions())
+    for path in paths:
+        if os.path.isdir(path):
+            for file in sorted(Path(path).rglob('*')):
+                if not file.is_file():
+                    continue
+                if _get_extension(file.name) in extensions or sniff_content and _has_signature(file):
+                    yield str(file)
+        else:
+            yield path
+
+
+def extract_file(path: str) -> dict:
+    """
+    Разбирает один файл парсером, найденным по первым байтам файла. Файл открывается один раз.
+    Ошибки не выбрасываются, а записываются в результат
+    """
+    result = {
+        'file': path,
+        'parser': None,
+        'result': None,
+        'error': None,
+        'time': None
+    }
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as stream:
+            parser = get_parser_by_content(stream)
+            if parser is None:
+                raise InvalidMagicException
+            result['parser'] = parser.__name__
+            result['result'] = parser(stream).extract()
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['time'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def extract_batch(paths: Iterable[str], workers: Optional[int] = None, queue_size: Optional[int] = None) -> Iterator[dict]:
+    """
+    Разбирает файлы в пуле из workers процессов и возвращает результаты extract_file по мере готовности.
+    Одновременно в очереди не больше queue_size файлов (по умолчанию вдвое больше числа процессов)
+    """
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or 2 * workers
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for path in paths:
+            if len(pending) >= queue_size:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(extract_file, path))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Пакетный разбор сцен, результат в JSON Lines')
+    parser.add_argument('paths', nargs='+', help='Файлы сцен или каталоги с ними')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Число процессов')
+    parser.add_argument('-q', '--queue-size', type=int, default=None, help='Максимум файлов в очереди')
+    parser.add_argument('-o', '--output', default=None, help='Файл для результата, по умолчанию stdout')
+    parser.add_argument('-s', '--sniff', action='store_true',
+                        help='Искать сцены в каталогах по содержимому файлов, а не только по расширению')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    errors = 0
+    try:
+        for result in extract_batch(iter_scene_files(args.paths, args.sniff), args.jobs, args.queue_size):
+            if result['error'] is not None:
+                errors += 1
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,8 @@
 import struct
 
-import olefile
-
 from scene_parser.exception.invalid_magic import InvalidMagicException
 from scene_parser.parser.max_document_summary import MaxDocumentSummaryParser
+from scene_parser.parser.ole_reader import OleReader
 from scene_parser.parser.max_chunk_parser import MaxChunkParser
 from scene_parser import print_debug
 from scene_parser.product import ProductBase
@@ -24,7 +23,7 @@ class A3DSMax(ProductBase):
     # OLE-архив, из которого открываем потоки
     _ole = None
 
-    # Поток, из которого читаем
+    # Содержимое потока, из которого читаем
     _stream = None
 
     # Здесь хранится результат парсинга
@@ -35,10 +34,14 @@ class A3DSMax(ProductBase):
             'product': '3dsmax'
         }
         try:
-            self._ole = olefile.OleFileIO(self._file)
+            self._ole = OleReader(self._file)
         except OSError:
             raise InvalidMagicException
-        self._stream = self._ole.openstream('\x05DocumentSummaryInformation')
+        # Из всего OLE-архива нужен только этот поток
+        try:
+            self._stream = self._ole.read_stream('\x05DocumentSummaryInformation')
+        finally:
+            self._ole.close()
 
         p = MaxDocumentSummaryParser(self._stream)
 
@@ -66,5 +69,11 @@ class A3DSMax(ProductBase):
         else:
             self._result['gammaCorrection'] = False
 
-        self._ole.close()
         return self._result
+
+    def extract_from_bytes(self, buffer) -> dict:
+        """
+        Разбирает сцену, уже прочитанную в память (bytes, bytearray, memoryview), без временного файла
+        """
+        self._file = buffer
+        return self.extract()
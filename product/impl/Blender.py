@@ -1,87 +1,109 @@
+import gzip
 import struct
-import blendfile
-import json
-import binascii
-import olefile
-import bpy
+import zlib
+from bisect import bisect_right
+from typing import Optional
 
 from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser.parser.blend_reader import BlendReader
 from scene_parser import print_debug
 from scene_parser.product import ProductBase
 
 
-def get_ext_by_(id) -> tuple:
+# Форматы вывода R_IMF_IMTYPE_*: id -> (расширение, первая версия, последняя версия или None)
+_IMAGE_TYPES = {
+    0: ('tagra', None, None),
+    1: ('iris', None, None),
+    2: ('hamx', None, 249),
+    3: ('ftype', None, 249),
+    4: ('jpeg90', None, None),
+    5: ('movie', None, 249),
+    7: ('iriz', None, None),
+    14: ('tga_raw', None, None),
+    15: ('avi_raw', None, 401),
+    16: ('avi_jpeg', None, 401),
+    17: ('png', None, None),
+    18: ('avi_codec', None, 279),
+    19: ('quicktime', None, 279),
+    20: ('bmp', None, None),
+    21: ('hdr', None, None),
+    22: ('tiff', None, None),
+    23: ('open_exr', None, None),
+    24: ('ffmpeg', None, None),
+    25: ('frameserver', None, 279),
+    26: ('cineon', None, None),
+    27: ('dpx', None, None),
+    28: ('open_exr_multilayer', None, None),
+    29: ('dds', None, None),
+    30: ('jp2', None, None),
+    31: ('h264', None, None),
+    32: ('xvid', None, None),
+    33: ('theora', None, None),
+    34: ('psd', None, None),
+    35: ('webp', 304, None),
+    36: ('av1', 300, None),
+}
+
+# Рендер-движки до 2.50, когда вместо строки r.engine было число r.renderer
+_ENGINES = {
+    0: ('BLENDER_RENDER', None, 249),
+    1: ('YAFRAY', None, 249),
+}
+
+
+def _make_tables(items: dict) -> tuple:
+    """
+    Раскладывает {id: (имя, первая версия, последняя версия)} по диапазонам версий.
+    Возвращает (границы диапазонов, [{id: имя}, ...]). Последний словарь -- для неизвестной версии, в нём все значения
+    """
+    bounds = sorted({since for _, since, _ in items.values() if since is not None}
+                    | {until + 1 for _, _, until in items.values() if until is not None})
+    tables = []
+    for version in [-1] + bounds:
+        tables.append({
+            id: name for id, (name, since, until) in items.items()
+            if (since is None or since <= version) and (until is None or version <= until)
+        })
+    tables.append({id: name for id, (name, _, _) in items.items()})
+    return bounds, tables
+
+
+_image_type_tables = _make_tables(_IMAGE_TYPES)
+_engine_tables = _make_tables(_ENGINES)
+
+
+def _lookup(tables, id, version) -> tuple:
     if id is None:
         return id, None
     try:
         id = int(id)
     except ValueError:
         return id, None
-    if id == 0:
-        return id, 'tagra'
-    if id == 1:
-        return id, 'iris'
-    if id == 2:
-        return id, 'hamx'
-    if id == 3:
-        return id, 'ftype'
-    if id == 4:
-        return id, 'jpeg90'
-    if id == 5:
-        return id, 'movie'
-    if id == 7:
-        return id, 'iriz'
-    if id == 14:
-        return id, 'tga_raw'
-    if id == 15:
-        return id, 'avi_raw'
-    if id == 16:
-        return id, 'avi_jpeg'
-    if id == 17:
-        return id, 'png'
-    if id == 20:
-        return id, 'bmp'
-    if id == 21:
-        return id, 'hdr'
-    if id == 22:
-        return id, 'tiff'
-    if id == 23:
-        return id, 'open_exr'
-    if id == 24:
-        return id, 'ffmpeg'
-    if id == 25:
-        return id, 'frameserver'
-    if id == 26:
-        return id, 'cineon'
-    if id == 27:
-        return id, 'dpx'
-    if id == 29:
-        return id, 'dds'
-    if id == 30:
-        return id, 'jp2'
-    if id == 31:
-        return id, 'h264'
-    if id == 32:
-        return id, 'xvid'
-    if id == 33:
-        return id, 'theora'
-    if id == 34:
-        return id, 'psd'
-    return id, None
-
-
-def get_engine_by_(id):
-    if id is None:
-        return id, None
-    try:
-        id = int(id)
-    except ValueError:
-        return id, None
-    return id, None
+    bounds, tables = tables
+    table = tables[-1] if version is None else tables[bisect_right(bounds, version)]
+    return id, table.get(id)
+
+
+def get_ext_by_(id, version: Optional[int] = None) -> tuple:
+    """
+    Возвращает (id, расширение) по R_IMF_IMTYPE_*. version -- версия файла, например 293.
+    Если в этой версии такого формата нет, расширение None
+    """
+    return _lookup(_image_type_tables, id, version)
+
+
+def get_engine_by_(id, version: Optional[int] = None) -> tuple:
+    """
+    Возвращает (id, имя движка) по r.renderer старых файлов. version -- версия файла
+    """
+    return _lookup(_engine_tables, id, version)
 
 
 # Код для парсинга новых blend файлов
 def extract_from_new_blend(filepath):
+        # bpy поднимает весь Blender, импортируем его только если об этом попросили явно (use_bpy)
+        import bpy
+
         with bpy.data.libraries.load(filepath) as (data_from, data_to):
             pass
 
@@ -152,117 +174,96 @@ class Blender(ProductBase):
     def get_supported_extensions() -> list:
         return ['blend']
 
-    def __init__(self, file):
+    def __init__(self, file, use_bpy: bool = False):
+        """
+        use_bpy -- если файл не удалось разобрать напрямую, открыть его через bpy. Нужен установленный Blender
+        """
         ProductBase.__init__(self, file)
+        self._use_bpy = use_bpy
 
     # Здесь хранится результат парсинга
     _result = None
 
+    # Открывать ли файл через bpy, если разобрать его напрямую не удалось
+    _use_bpy = False
 
-    ### Also, may try repairing existing code with snippets from https://formats.kaitai.io/blender_blend/python.html.
+    # Ошибки разбора, после которых файл считается не blend файлом
+    _parse_errors = (ValueError, KeyError, AttributeError, struct.error, EOFError, zlib.error, gzip.BadGzipFile)
 
     def extract(self) -> dict:
         try:
-            blend = blendfile.open_blend(self._file)
-            print(blend)
-
-            scene = None
-            self._result = {
-            'product': 'blender'
-            }
-
-            for block in blend.blocks:
-                if block.code == b'SC':
-                    scene = block
-                    break
-
-            version = str(blend.header.version)
-            self._result['version'] = version[0] + '.' + version[1:]
-
-            self._result['firstFrame'] = scene.get((b'r', b'sfra'))
-            self._result['lastFrame'] = scene.get((b'r', b'efra'))
-            self._result['nthFrame'] = scene.get((b'r', b'frame_step'), 1)
-            self._result['width'] = scene.get((b'r', b'xsch'))
-            self._result['height'] = scene.get((b'r', b'ysch'))
-            self._result['render'] = scene.get((b'r', b'engine'), None)
-            if self._result['render'] is not None:
-                self._result['render'] = self._result['render'].replace('BLENDER_', '')
-
-            output = scene.get((b'r', b'pic'))
-            self._result['outputName'] = output.split("\\")[-1]
-
-            imtype = scene.get((b'r', b'im_format', b'imtype'), None)
-            if imtype is None:
-                imtype = scene.get((b'r', b'imtype'), None)
-            self._result['ext_id'], self._result['ext'] = get_ext_by_(imtype)
-            if self._result['ext'] is not None:
-                self._result.pop('ext_id')
-
-            self._result['cameras'] = []
-            for block in blend.blocks:
-                if block.code == b'OB':
-                    if block.get(b'type') == 11:
-                        name = block.get((b'id', b'name'))[2:]
-                        self._result['cameras'].append(name)
-
-        except Exception:
-            #Нужно добавить bpy вот в этом самом месте
-            self._result = extract_from_new_blend(self._file)
-            if self._result is None:
-                raise InvalidMagicException
+            self._result = self._read(self._file)
+        except InvalidMagicException:
+            if not self._use_bpy:
+                raise
+            print_debug('Открываем blend файл через bpy')
+            self._result = extract_from_new_blend(getattr(self._file, 'name', self._file))
         return self._result
-        
 
-    def extract_from_hex(self: str) -> dict:
-    # Convert hex string to byte string
-        byte_string = bytes.fromhex(self)
-        print(byte_string)
-    # Parse byte string as blend file
-        blend = blendfile.from_string(byte_string)
+    def _read(self, file) -> dict:
+        """
+        Разбирает file через BlendReader. Ошибки разбора превращаются в InvalidMagicException
+        """
+        try:
+            blend = BlendReader(file)
+            try:
+                return self._extract(blend)
+            finally:
+                blend.close()
+        except self._parse_errors as e:
+            print_debug(f'Не удалось разобрать blend файл: {e}')
+            raise InvalidMagicException
+
+    @staticmethod
+    def _extract(blend) -> dict:
+        """
+        Достаёт настройки рендера из первой сцены и имена камер
+        """
+        scene = blend.find_block(b'SC')
+        if scene is None:
+            raise ValueError('Сцена не найдена')
 
-        scene = None
         result = {
             'product': 'blender'
-    }
-
-        for block in blend.blocks:
-            if block.code == b'SC':
-                scene = block
-            break
+        }
 
-        version = str(blend.header.version)
+        version = str(blend.version)
         result['version'] = version[0] + '.' + version[1:]
 
-        result['firstFrame'] = scene.get((b'r', b'sfra'))
-        result['lastFrame'] = scene.get((b'r', b'efra'))
-        result['nthFrame'] = scene.get((b'r', b'frame_step'), 1)
-        result['width'] = scene.get((b'r', b'xsch'))
-        result['height'] = scene.get((b'r', b'ysch'))
-        result['render'] = scene.get((b'r', b'engine'), None)
+        result['firstFrame'] = blend.get(scene, (b'r', b'sfra'))
+        result['lastFrame'] = blend.get(scene, (b'r', b'efra'))
+        result['nthFrame'] = blend.get(scene, (b'r', b'frame_step'), 1)
+        result['width'] = blend.get(scene, (b'r', b'xsch'))
+        result['height'] = blend.get(scene, (b'r', b'ysch'))
+        result['render'] = blend.get(scene, (b'r', b'engine'), None)
+        if result['render'] is None:
+            # До 2.50 движок хранился числом
+            _, result['render'] = get_engine_by_(blend.get(scene, (b'r', b'renderer'), None), blend.version)
         if result['render'] is not None:
             result['render'] = result['render'].replace('BLENDER_', '')
 
-        output = scene.get((b'r', b'pic'))
+        output = blend.get(scene, (b'r', b'pic'))
         result['outputName'] = output.split("\\")[-1]
 
-        imtype = scene.get((b'r', b'im_format', b'imtype'), None)
+        imtype = blend.get(scene, (b'r', b'im_format', b'imtype'), None)
         if imtype is None:
-            imtype = scene.get((b'r', b'imtype'), None)
-        result['ext_id'], result['ext'] = get_ext_by_(imtype)
+            imtype = blend.get(scene, (b'r', b'imtype'), None)
+        result['ext_id'], result['ext'] = get_ext_by_(imtype, blend.version)
         if result['ext'] is not None:
             result.pop('ext_id')
 
         result['cameras'] = []
-        for block in blend.blocks:
-            if block.code == b'OB':
-                if block.get(b'type') == 11:
-                    name = block.get((b'id', b'name'))[2:]
-                    result['cameras'].append(name)
-
-    # Convert result to JSON
-        json_string = json.dumps(result)
+        for block in blend.find_blocks(b'OB'):
+            if blend.get(block, b'type') == 11:
+                name = blend.get(block, (b'id', b'name'))[2:]
+                result['cameras'].append(name)
 
-    # Parse JSON to a dictionary
-        result_dict = json.loads(json_string)
+        return result
 
-        return result_dict
\ No newline at end of file
+    def extract_from_bytes(self, buffer) -> dict:
+        """
+        Разбирает сцену, уже прочитанную в память (bytes, bytearray, memoryview), без временного файла.
+        Несжатое содержимое читается на месте, сжатое распаковывается потоком
+        """
+        self._result = self._read(buffer)
+        return self._result
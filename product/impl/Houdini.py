@@ -1,11 +1,59 @@
+import fnmatch
+import mmap
+import os
+import re
 import struct
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Optional
 
 from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser.parser.buffer import as_buffer
 from scene_parser import print_debug
 from scene_parser.product import ProductBase
 
 
+# Разделитель значений, начало и конец массива в значениях параметра
+_ARRAY_RE = re.compile(r'\t|\[ | \]')
+
+# Начало вложенного массива и конец массива внутри массива
+_NESTED_RE = re.compile(r'\[| \] ')
+
+# Переменная в строке: $VAR или ${VAR}. $$ -- экранированный знак доллара
+_VARIABLE_RE = re.compile(r'\$(?:(\$)|\{(\w+)\}|(\w*))', re.ASCII)
+
+# Номер кадра, дополненный нулями до 1..9 знаков: $F1..$F9
+_FRAME_RE = re.compile(r'F([1-9])')
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(data) -> tuple:
+    """
+    Разбивает строку на куски текста и имена переменных между ними: ((текст, ...), (имя, ...)).
+    Текстов всегда на один больше, чем имён
+    """
+    parts = _VARIABLE_RE.split(data)
+    literals = [parts[0]]
+    names = []
+    for i in range(1, len(parts), 4):
+        dollar, braced, name, literal = parts[i:i + 4]
+        if dollar:
+            literals[-1] += dollar + literal
+        else:
+            names.append(braced or name)
+            literals.append(literal)
+    return tuple(literals), tuple(names)
+
+
+def _parse_node(variables, node_name, data) -> dict:
+    """
+    Разбирает параметры одной рендер-ноды в процессе пула
+    """
+    houdini = Houdini(None)
+    houdini._variables = variables
+    return houdini._parse_parms(node_name, data)
+
+
 class Houdini(ProductBase):
     @staticmethod
     def get_product_name() -> str:
@@ -15,11 +63,32 @@ class Houdini(ProductBase):
     def get_supported_extensions() -> []:
         return ['hip', 'hiplc']
 
-    def __init__(self, file):
+    def __init__(self, file, nodes: Optional[list] = None, workers: Optional[int] = None):
+        """
+        nodes -- пути или glob-шаблоны рендер-нод, которые нужно разобрать, например /out/mantra_*.
+        Если не заданы, разбираются все ноды.
+        workers -- число процессов для разбора параметров нод. Если не задано, ноды разбираются в текущем процессе
+        """
         ProductBase.__init__(self, file)
+        self._nodes = None
+        if nodes:
+            self._nodes = re.compile('|'.join(fnmatch.translate(node) for node in nodes))
+        self._workers = workers
 
-    # Поток, из которого читаем
-    _stream = None
+    # Шаблон путей нужных рендер-нод или None, если нужны все
+    _nodes = None
+
+    # Число процессов для разбора нод
+    _workers = None
+
+    # Содержимое архива: отображённый в память файл или bytes
+    _buffer = None
+
+    # Отображение создано здесь, а не передано вызывающим, и закрывается после разбора
+    _owns_buffer = False
+
+    # Индекс файлов архива: [(имя, смещение содержимого, размер), ...]
+    _entries = None
 
     # Здесь хранится результат парсинга
     _result = None
@@ -29,10 +98,13 @@ class Houdini(ProductBase):
 
     # Допустимая магия файла
     _magic = [
-        '070707',
-        'HouLC\x1a'
+        b'070707',
+        b'HouLC\x1a'
     ]
 
+    # Заголовок odc CPIO после магии: dev, ino, mode, uid, gid, nlink, rdev, mtime, namesize, filesize
+    _odc_header = struct.Struct('6s6s6s6s6s6s6s11s6s11s')
+
     def _parse_variables(self, data):
         self._variables = {}
         for line in data.split('\n'):
@@ -45,66 +117,99 @@ class Houdini(ProductBase):
                 self._variables[key] = value
 
     def _parse_array(self, data):
+        """
+        Разбирает значения параметра, разделённые табуляцией. Вложенный "[ ... ] " разбирается в список.
+        Один проход по строке: ищем только специальные последовательности и берём срезы между ними
+        """
         result = []
 
         i = 0
-        value = ''
-        while i < len(data):
-            if data[i] == '\t':
-                result.append(value)
-                value = ''
-            elif data[i:i+2] == '[ ':
-                i += 2
+        # Начало текущего значения
+        start = 0
+        while True:
+            m = _ARRAY_RE.search(data, i)
+            if m is None:
+                break
+            pos = m.start()
+            token = m.group()
+            if token == '\t':
+                result.append(data[start:pos])
+                i = start = pos + 1
+            elif token == ' ]':
+                return result
+            else:
+                # Ищем конец массива, считая вложенность. Сами скобки в содержимое не попадают
+                parts = []
+                i = pos + 2
                 count = 1
-                arr = ""
                 while count != 0:
-                    if i >= len(data):
+                    m = _NESTED_RE.search(data, i)
+                    if m is None:
                         return result
-                    if data[i] == '[':
-                        i += 1
+                    parts.append(data[i:m.start()])
+                    if m.group() == '[':
                         count += 1
-                    elif data[i:i+3] == ' ] ':
-                        i += 2
-                        count -= 1
+                        i = m.start() + 2
                     else:
-                        arr += data[i]
-                    i += 1
-                value = self._parse_array(arr)
-                result.append(value)
-                value = ''
-            elif data[i:i+2] == ' ]':
-                return result
-            else:
-                value += data[i]
-            i += 1
+                        count -= 1
+                        i = m.start() + 3
+                result.append(self._parse_values(''.join(parts)))
+                # Символ после массива пропускается
+                i = start = i + 1
 
-        if isinstance(value, str) and len(value) > 1:
+        value = data[start:]
+        if len(value) > 1:
             if value[0] == '"' and value[-1] == '"':
                 value = value[1:-1]
 
         result.append(value)
         return result
 
-    def _eval(self, data):
-        result = ''
-        i = 0
-        while i < len(data):
-            if data[i] == '$':
-                i += 1
-                name = ''
-                while data[i].isalnum():
-                    name += data[i]
-                    i += 1
-
-                if name in self._variables:
-                    result += self._variables[name]
-
-                result += data[i]
-            else:
-                result += data[i]
-            i += 1
+    @staticmethod
+    def _parse_values(data):
+        """
+        Разбирает содержимое массива: значения, разделённые табуляцией, до " ]"
+        """
+        pos = data.find(' ]')
+        if pos != -1:
+            return data[:pos].split('\t')[:-1]
+
+        result = data.split('\t')
+        value = result[-1]
+        if len(value) > 1:
+            if value[0] == '"' and value[-1] == '"':
+                result[-1] = value[1:-1]
         return result
 
+    def _get_variable(self, name, overlay) -> str:
+        """
+        Значение переменной: сначала из переменных ноды, затем из .variables.
+        $F1..$F9 форматируются из первого кадра ноды только тогда, когда встречаются в строке
+        """
+        if name in overlay:
+            return overlay[name]
+        if 'F' in overlay:
+            m = _FRAME_RE.fullmatch(name)
+            if m is not None:
+                return f'{int(overlay["F"]):0{m.group(1)}}'
+        return self._variables.get(name, '')
+
+    def _eval(self, data, overlay=None):
+        """
+        Подставляет переменные $VAR и ${VAR}. overlay -- переменные ноды, которые перекрывают .variables.
+        Неизвестные переменные заменяются пустой строкой
+        """
+        literals, names = _compile_template(data)
+        if not names:
+            return literals[0]
+
+        overlay = overlay or {}
+        parts = [literals[0]]
+        for name, literal in zip(names, literals[1:]):
+            parts.append(self._get_variable(name, overlay))
+            parts.append(literal)
+        return ''.join(parts)
+
     def _parse_render_path(self, path) -> Optional[str]:
         if 'hick' in path or 'htoa' in path:
             return 'arnold'
@@ -138,7 +243,8 @@ class Houdini(ProductBase):
 
         result['renderNodeName'] = f'/out/{node_name}'
 
-        self._variables['OS'] = node_name
+        # Переменные ноды, общие self._variables не меняются
+        overlay = {'OS': node_name}
 
         if 'soho_pipecmd' in parms:
             if parms['soho_pipecmd']:
@@ -172,9 +278,7 @@ class Houdini(ProductBase):
                 result['nthFrame'] = int(parms['f'][2][1])
             else:
                 result['nthFrame'] = int(parms['f'][2])
-            for i in range(1, 10):
-                fmt = '{:0' + str(i) + '}'
-                self._variables[f'F{i}'] = fmt.format(result['firstFrame'])
+            overlay['F'] = str(result['firstFrame'])
         else:
             result['firstFrame'] = None
             result['lastFrame'] = None
@@ -202,14 +306,14 @@ class Houdini(ProductBase):
 
         if 'vm_picture' in parms:
             try:
-                out = self._eval(parms['vm_picture'][0])
+                out = self._eval(parms['vm_picture'][0], overlay)
                 out = out.split('/')[-1].split('\\')[-1]
                 ext = out.split('.')[-1]
                 out = "".join(out.split('.')[:-1])
                 result['outputFile'] = out
                 result['ext'] = ext
             except:
-                result['outputFile'] = self._eval(parms['vm_picture'][0])
+                result['outputFile'] = self._eval(parms['vm_picture'][0], overlay)
                 result['ext'] = None
         else:
             result['outputFile'] = None
@@ -217,98 +321,142 @@ class Houdini(ProductBase):
 
         return result
 
-    def _read_header(self, magic) -> tuple:
-        if magic == '070707':
-            dev = self._stream.read(6)
-            ino = self._stream.read(6)
-            mode = self._stream.read(6)
-            uid = self._stream.read(6)
-            gid = self._stream.read(6)
-            nlink = self._stream.read(6)
-            rdev = self._stream.read(6)
-            mtime = self._stream.read(11)
-            namesize = int(self._stream.read(6), 8)
-            filesize = int(self._stream.read(11), 8)
-            # print(f'found name length: {namesize} bytes')
-            filename = self._stream.read(namesize)
-            # print(f'{filename} of size {filesize}')
-            return filesize, filename
-        elif magic == 'HouLC\x1a':
-            flags = self._stream.read(28)
-            filesize = None
-            filename = ''
-            c = ''
-            while c != '\0':
-                c = self._stream.read(1)
-                filename += c
-            return filesize, filename
-        else:
-            raise InvalidMagicException
+    def _open_buffer(self):
+        """
+        Отображает файл в память. Для потока без файла читает его содержимое целиком.
+        Содержимое, переданное как bytes-like, используется как есть
+        """
+        if isinstance(self._file, (bytes, bytearray, memoryview)):
+            return as_buffer(self._file)
+        if isinstance(self._file, (str, os.PathLike)):
+            with open(self._file, 'rb') as f:
+                return self._map(f)
+        # Уже открытый бинарный поток
+        try:
+            return self._map(self._file)
+        except (AttributeError, OSError, ValueError):
+            self._file.seek(0)
+            return self._file.read()
 
-    def _read_file(self, magic, filesize=None) -> str:
-        if filesize is not None:
-            return self._stream.read(filesize)
-        else:
-            data = ''
-            delimiter = self._stream.read(6)
-            while delimiter != magic:
-                c = self._stream.read(1)
-                if len(c) == 0:
-                    return data
-                data += delimiter[0]
-                delimiter = delimiter[1:] + c
-            self._stream.seek(self._stream.tell() - 6)
-            return data
-
-    def _skip_file(self, magic, filesize=None) -> None:
-        if filesize is not None:
-            self._stream.seek(self._stream.tell() + filesize)
-        else:
-            self._read_file(magic, filesize)
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _index_entries(self, magic) -> list:
+        """
+        Строит индекс файлов архива [(имя, смещение содержимого, размер), ...] по заголовкам, не читая содержимое
+        """
+        buf = self._buffer
+        entries = []
+        pos = 0
+        while buf[pos:pos + 6] == magic:
+            pos += 6
+            if magic == b'070707':
+                if pos + self._odc_header.size > len(buf):
+                    break
+                fields = self._odc_header.unpack_from(buf, pos)
+                namesize = int(fields[8], 8)
+                filesize = int(fields[9], 8)
+                pos += self._odc_header.size
+                name = buf[pos:pos + namesize].split(b'\0', 1)[0]
+                offset = pos + namesize
+            else:
+                # HouLC: 28 байт флагов, имя до \0, содержимое до следующей магии
+                pos += 28
+                end = buf.find(b'\0', pos)
+                if end == -1:
+                    break
+                name = buf[pos:end]
+                offset = end + 1
+                end = buf.find(magic, offset)
+                if end == -1:
+                    end = len(buf)
+                filesize = end - offset
+            entries.append((name.decode(errors='backslashreplace'), offset, filesize))
+            pos = offset + filesize
+        return entries
+
+    def _read_entry(self, offset, size) -> str:
+        """
+        Декодирует содержимое файла архива, переводы строк приводятся к \\n
+        """
+        data = self._buffer[offset:offset + size].decode(errors='backslashreplace')
+        return data.replace('\r\n', '\n').replace('\r', '\n')
 
     def extract(self) -> dict:
-        self._stream = open(self._file, 'r', errors='backslashreplace')
-
+        self._buffer = self._open_buffer()
+        self._owns_buffer = not isinstance(self._file, (bytes, bytearray, memoryview))
+        try:
+            return self._extract()
+        finally:
+            if self._owns_buffer and isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+            self._buffer = None
+
+    def extract_from_bytes(self, buffer) -> dict:
+        """
+        Разбирает сцену, уже прочитанную в память (bytes, bytearray, memoryview), без временного файла
+        """
+        self._file = buffer
+        return self.extract()
+
+    def _extract(self) -> dict:
         self._result = {
             'product': 'houdini',
             'renderNodes': []
         }
 
-        magic = self._stream.read(6)
+        magic = self._buffer[:6]
 
-        if magic == 'HouLC\x1a':
+        if magic == b'HouLC\x1a':
             print_debug('Houdini Limited Commercial')
             self._result['limitedCommercial'] = True
-        elif magic == '070707':
+        elif magic == b'070707':
             print_debug('Houdini Core/FX')
             self._result['limitedCommercial'] = False
         else:
             raise InvalidMagicException
 
-        while magic in self._magic:
+        self._entries = self._index_entries(magic)
 
-            filesize, filename = self._read_header(magic)
-
-            if filename == '.variables\0':
+        # Параметры нужных нод в порядке архива: [(имя ноды, содержимое .parm), ...]
+        nodes = []
+        for filename, offset, size in self._entries:
+            if filename == '.variables':
                 print_debug('Найден файл .variables')
-                f = self._read_file(magic, filesize)
+                f = self._read_entry(offset, size)
                 self._parse_variables(f)
                 if '_HIP_SAVEVERSION' in self._variables:
                     self._result['version'] = self._variables['_HIP_SAVEVERSION']
                 else:
                     self._result['version'] = None
             elif filename.startswith('out/') and '.parm' in filename:
-                node_name = filename[4:-6]
+                node_name = filename[4:-5]
+                if self._nodes is not None and not self._nodes.match(f'/out/{node_name}'):
+                    # Нода не запрошена, её параметры не читаем
+                    continue
                 print_debug(node_name)
                 print_debug(f'Найдены параметры рендер-ноды {node_name}')
-                f = self._read_file(magic, filesize)
-                render_node = self._parse_parms(node_name, f)
-                if render_node['render'] is not None:
-                    self._result['renderNodes'].append(render_node)
-            else:
-                self._skip_file(magic, filesize)
-
-            magic = self._stream.read(6)
-            # print(f'>{magic}<')
-
-        return self._result
\ No newline at end of file
+                nodes.append((node_name, self._read_entry(offset, size)))
+
+        for render_node in self._parse_nodes(nodes):
+            if render_node['render'] is not None:
+                self._result['renderNodes'].append(render_node)
+
+        return self._result
+
+    def _parse_nodes(self, nodes) -> list:
+        """
+        Разбирает параметры нод. Разбор нод не зависит друг от друга, поэтому при workers > 1 он идёт в пуле процессов.
+        Порядок результата совпадает с порядком нод в архиве
+        """
+        if not self._workers or self._workers < 2 or len(nodes) < 2:
+            return [self._parse_parms(node_name, data) for node_name, data in nodes]
+
+        variables = [self._variables] * len(nodes)
+        names = [node_name for node_name, _ in nodes]
+        data = [data for _, data in nodes]
+        with ProcessPoolExecutor(max_workers=min(self._workers, len(nodes))) as pool:
+            return list(pool.map(_parse_node, variables, names, data))
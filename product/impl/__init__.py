@@ -1,13 +1,28 @@
+from functools import lru_cache
 from inspect import isclass
 from pkgutil import iter_modules
 from pathlib import Path
 from importlib import import_module
+from typing import Optional
 
 from scene_parser import print_debug
 from scene_parser.product import ProductBase
 
 
-def get_product_parsers() -> []:
+# Расширение -> (модуль, класс) парсера. Модуль импортируется только при первом обращении к расширению
+_extensions = {
+    'max': ('A3DSMax', 'A3DSMax'),
+    'blend': ('Blender', 'Blender'),
+    'hip': ('Houdini', 'Houdini'),
+    'hiplc': ('Houdini', 'Houdini'),
+}
+
+
+@lru_cache(maxsize=None)
+def get_product_parsers() -> tuple:
+    """
+    Возвращает классы всех парсеров. Результат кэшируется, поэтому это кортеж
+    """
     result = []
 
     scan_dir = Path(__file__).resolve().parent
@@ -28,4 +43,26 @@ def get_product_parsers() -> []:
                     result.append(attribute)
 
     print_debug('')
-    return result
\ No newline at end of file
+    return tuple(result)
+
+
+def get_supported_extensions() -> list:
+    """
+    Возвращает все поддерживаемые расширения, не импортируя модули парсеров
+    """
+    return list(_extensions)
+
+
+@lru_cache(maxsize=None)
+def get_product_parser(extension: str) -> Optional[type]:
+    """
+    Возвращает класс парсера для расширения (без точки) или None, если оно не поддерживается.
+    Модуль парсера импортируется при первом обращении
+    """
+    extension = extension.lower()
+    if extension not in _extensions:
+        return None
+    module_name, class_name = _extensions[extension]
+    print_debug(f'Импортируем {__name__}.{module_name} для .{extension}')
+    module = import_module(f'{__name__}.{module_name}')
+    return getattr(module, class_name)
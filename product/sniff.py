@@ -0,0 +1,74 @@
+"""
+Определение типа сцены по первым байтам файла, а не по расширению.
+"""
+from typing import BinaryIO, Optional
+
+from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser import print_debug
+from scene_parser.product.impl import get_product_parser
+
+
+# Сколько байт читаем из начала файла
+HEADER_SIZE = 64
+
+# Сигнатура -> расширение, по которому ищется парсер
+SIGNATURES = [
+    # OLE Compound File
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'max'),
+    (b'BLENDER', 'blend'),
+    # Сжатые blend: gzip и zstd
+    (b'\x1f\x8b', 'blend'),
+    (b'\x28\xb5\x2f\xfd', 'blend'),
+    (b'070707', 'hip'),
+    (b'HouLC\x1a', 'hiplc'),
+    # Сигнатуры Maya (FOR4, FOR8, //Maya ASCII) не добавлены, пока для неё нет парсера продукта
+]
+
+
+def sniff(header: bytes) -> Optional[str]:
+    """
+    Возвращает расширение, соответствующее сигнатуре в header, или None, если она неизвестна
+    """
+    for signature, extension in SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+def get_parser_by_content(stream: BinaryIO) -> Optional[type]:
+    """
+    Читает HEADER_SIZE байт из начала потока и возвращает класс парсера или None.
+    Поток возвращается в начало
+    """
+    stream.seek(0)
+    header = stream.read(HEADER_SIZE)
+    stream.seek(0)
+
+    extension = sniff(header)
+    if extension is None:
+        return None
+    print_debug(f'По сигнатуре найдено расширение {extension}')
+    return get_product_parser(extension)
+
+
+def extract(path: str) -> dict:
+    """
+    Открывает файл один раз, определяет парсер по содержимому и передаёт ему открытый поток
+    """
+    with open(path, 'rb') as stream:
+        parser = get_parser_by_content(stream)
+        if parser is None:
+            raise InvalidMagicException
+        return parser(stream).extract()
+
+
+def extract_bytes(buffer) -> dict:
+    """
+    Разбирает сцену, уже прочитанную в память (bytes, bytearray, memoryview), без временного файла.
+    Парсер определяется по первым байтам содержимого. Все парсеры принимают содержимое вместо файла
+    """
+    extension = sniff(bytes(buffer[:HEADER_SIZE]))
+    parser = get_product_parser(extension) if extension is not None else None
+    if parser is None:
+        raise InvalidMagicException
+    return parser(buffer).extract()
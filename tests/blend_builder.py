@@ -0,0 +1,132 @@
+"""
+Сборка небольших .blend файлов с минимальной SDNA для тестов: 4 и 8 байт указатели, оба порядка байт,
+большой заголовок блоков (BLENDER17-01v0500)
+"""
+import re
+import struct
+
+# Структуры: (имя, [(тип, имя поля), ...])
+STRUCTS = [
+    ('ID', [('void', '*next'), ('void', '*prev'), ('char', 'name[66]'), ('short', 'flag'), ('int', 'tag')]),
+    ('ImageFormatData', [('char', 'depth'), ('char', 'planes'), ('char', 'imtype'), ('char', 'quality')]),
+    ('RenderData', [('short', 'xsch'), ('short', 'ysch'), ('int', 'sfra'), ('int', 'efra'), ('int', 'frame_step'),
+                    ('ImageFormatData', 'im_format'), ('char', 'pic[1024]'), ('char', 'engine[32]'),
+                    ('float', 'mat[2][3]'), ('int', '(*func)()')]),
+    ('Scene', [('ID', 'id'), ('void', '*camera'), ('RenderData', 'r')]),
+    ('Object', [('ID', 'id'), ('void', '*data'), ('short', 'type'), ('short', 'partype')]),
+]
+
+# Структуры до 2.50: формат вывода imtype и число renderer прямо в RenderData
+STRUCTS_249 = [
+    STRUCTS[0],
+    ('RenderData', [('short', 'xsch'), ('short', 'ysch'), ('int', 'sfra'), ('int', 'efra'), ('int', 'frame_step'),
+                    ('short', 'imtype'), ('short', 'renderer'), ('char', 'pic[240]')]),
+    ('Scene', [('ID', 'id'), ('RenderData', 'r')]),
+    ('Object', [('ID', 'id'), ('short', 'type'), ('short', 'partype')]),
+]
+
+_BASIC = {'char': 1, 'short': 2, 'int': 4, 'float': 4, 'void': 0}
+_FORMATS = {'char': 'b', 'short': 'h', 'int': 'i', 'float': 'f'}
+
+
+def _pad4(data: bytes) -> bytes:
+    return data + b'\0' * ((4 - len(data) % 4) % 4)
+
+
+def _dims(field: str) -> list:
+    return [int(dim) for dim in re.findall(r'\[(\d+)\]', field)]
+
+
+def _count(field: str) -> int:
+    count = 1
+    for dim in _dims(field):
+        count *= dim
+    return count
+
+
+def _is_pointer(field: str) -> bool:
+    return field.startswith('*') or field.startswith('(*')
+
+
+def _sizes(structs: list, pointer_size: int) -> dict:
+    sizes = dict(_BASIC)
+    for name, fields in structs:
+        sizes[name] = sum((pointer_size if _is_pointer(field) else sizes[type_name]) * _count(field)
+                          for type_name, field in fields)
+    return sizes
+
+
+def pack_struct(structs: list, name: str, values: dict, pointer_size: int, endian: str, prefix: str = '') -> bytes:
+    """
+    Упаковывает структуру name. values -- {'r.sfra': 1, 'id.name': 'SCScene', ...}, остальные поля нулевые
+    """
+    types = dict(structs)
+    out = b''
+    for type_name, field in types[name]:
+        key = prefix + re.search(r'\w+', field).group()
+        count = _count(field)
+        if _is_pointer(field):
+            out += b'\x11' * pointer_size * count
+        elif type_name in types:
+            out += pack_struct(structs, type_name, values, pointer_size, endian, key + '.')
+        elif type_name == 'char' and _dims(field):
+            out += (values.get(key, '').encode() + b'\0' * count)[:count]
+        else:
+            value = values.get(key, 0)
+            out += struct.pack(f'{endian}{count}{_FORMATS[type_name]}', *(value if isinstance(value, list) else [value] * count))
+    return out
+
+
+def make_dna(structs: list, pointer_size: int, endian: str) -> bytes:
+    names = []
+    for _, fields in structs:
+        for _, field in fields:
+            if field not in names:
+                names.append(field)
+    types = list(_BASIC) + [name for name, _ in structs]
+    sizes = _sizes(structs, pointer_size)
+
+    out = b'SDNANAME' + struct.pack(endian + 'i', len(names)) + b''.join(name.encode() + b'\0' for name in names)
+    out = _pad4(out) + b'TYPE' + struct.pack(endian + 'i', len(types)) + b''.join(t.encode() + b'\0' for t in types)
+    out = _pad4(out) + b'TLEN' + struct.pack(f'{endian}{len(types)}h', *(sizes[t] for t in types))
+    out = _pad4(out) + b'STRC' + struct.pack(endian + 'i', len(structs))
+    for name, fields in structs:
+        out += struct.pack(endian + 'hh', types.index(name), len(fields))
+        for type_name, field in fields:
+            out += struct.pack(endian + 'hh', types.index(type_name), names.index(field))
+    return out
+
+
+def make_blend(scene: dict, cameras: list = (), version: int = 293, pointer_size: int = 8, endian: str = '<',
+               large: bool = False, structs: list = STRUCTS, dna: bool = True) -> bytes:
+    """
+    Файл со сценой scene (см. pack_struct), объектами-камерами cameras и лишними блоками вокруг них.
+    Если не dna, то блок DNA1 не записывается
+    """
+    indexes = {name: i for i, (name, _) in enumerate(structs)}
+    if large:
+        out = b'BLENDER17-01v%04d' % version
+    else:
+        out = b'BLENDER' + (b'_' if pointer_size == 4 else b'-') + (b'v' if endian == '<' else b'V') + b'%03d' % version
+
+    def block(code, data, sdna_index=0, count=1):
+        if large:
+            return struct.pack(endian + '4siQqq', code, sdna_index, 0x1234, len(data), count) + data
+        if pointer_size == 4:
+            return struct.pack(endian + '4siIii', code, len(data), 0x1234, sdna_index, count) + data
+        return struct.pack(endian + '4siQii', code, len(data), 0x1234, sdna_index, count) + data
+
+    blocks = [block(b'REND', b'\0' * 72), block(b'TEST', b'\x01' * 100)]
+    blocks.append(block(b'OB\0\0', pack_struct(structs, 'Object', {'id.name': 'OBCube', 'type': 1}, pointer_size, endian),
+                        indexes['Object']))
+    blocks.append(block(b'SC\0\0', pack_struct(structs, 'Scene', scene, pointer_size, endian), indexes['Scene']))
+    # Вторая сцена не должна читаться
+    blocks.append(block(b'SC\0\0', pack_struct(structs, 'Scene', {'r.sfra': 999}, pointer_size, endian), indexes['Scene']))
+    for name in cameras:
+        blocks.append(block(b'OB\0\0', pack_struct(structs, 'Object', {'id.name': 'OB' + name, 'type': 11},
+                                                   pointer_size, endian), indexes['Object']))
+        blocks.append(block(b'CA\0\0', b'\0' * 40))
+    if dna:
+        blocks.append(block(b'DNA1', make_dna(structs, pointer_size, endian)))
+    blocks.append(block(b'ENDB', b''))
+    return out + b''.join(blocks)
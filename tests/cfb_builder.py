@@ -0,0 +1,132 @@
+"""
+Сборка небольших OLE Compound File (CFB) для тестов: обычные потоки, mini stream, DIFAT.
+Секторы раскладываются в случайном порядке, чтобы цепочки не шли подряд
+"""
+import random
+import struct
+
+MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+END_OF_CHAIN = 0xFFFFFFFE
+FREE = 0xFFFFFFFF
+FAT_SECTOR = 0xFFFFFFFD
+DIFAT_SECTOR = 0xFFFFFFFC
+
+MINI_CUTOFF = 4096
+MINI_SECTOR_SIZE = 64
+
+
+def _entry(name: str, entry_type: int, left: int, right: int, child: int, start: int, size: int) -> bytes:
+    raw = name.encode('utf-16-le') + b'\0\0' if name else b''
+    return struct.pack('<64sHBBIII16sI8s8sIQ', raw, len(raw), entry_type, 1, left, right, child,
+                       b'\0' * 16, 0, b'\0' * 8, b'\0' * 8, start, size)
+
+
+def make_cfb(streams: list, version: int = 3, pad_sectors: int = 0, seed: int = 0) -> tuple:
+    """
+    streams -- [(имя, содержимое), ...] в корне файла. pad_sectors -- сколько пустых секторов добавить,
+    чтобы FAT не поместилась в 109 записей заголовка и понадобилась цепочка DIFAT.
+    Возвращает (содержимое файла, {ключ цепочки: [номера секторов]}, [номера секторов FAT], размер сектора).
+    Ключи цепочек: 'dir', 'mini', 'minifat' и имена потоков, которые лежат вне mini stream
+    """
+    rnd = random.Random(seed)
+    sector_size = 512 if version == 3 else 4096
+    per_sector = sector_size // 4
+
+    # Маленькие потоки складываем в mini stream
+    mini = bytearray()
+    mini_fat = []
+    entries = []
+    for name, data in streams:
+        if len(data) < MINI_CUTOFF:
+            count = (len(data) + MINI_SECTOR_SIZE - 1) // MINI_SECTOR_SIZE
+            start = len(mini_fat) if count else END_OF_CHAIN
+            for i in range(count):
+                mini_fat.append(len(mini_fat) + 1 if i < count - 1 else END_OF_CHAIN)
+            mini += data + b'\0' * (count * MINI_SECTOR_SIZE - len(data))
+            entries.append((name, start, len(data)))
+        else:
+            entries.append((name, None, len(data)))
+
+    dir_sectors = (len(entries) + 1 + sector_size // 128 - 1) // (sector_size // 128)
+    payloads = [
+        ('mini', bytes(mini)),
+        ('minifat', struct.pack(f'<{len(mini_fat)}I', *mini_fat)),
+        ('pad', b'\0' * sector_size * pad_sectors),
+        ('dir', b'\0' * sector_size * dir_sectors),
+    ]
+    payloads += [(name, data) for name, data in streams if len(data) >= MINI_CUTOFF]
+    counts = [(len(data) + sector_size - 1) // sector_size for _, data in payloads]
+
+    # Число секторов FAT и DIFAT зависит от общего числа секторов, в том числе от них самих
+    fat_count, difat_count = 1, 0
+    while True:
+        total = sum(counts) + fat_count + difat_count
+        need_fat = (total + per_sector - 1) // per_sector
+        need_difat = max(0, (need_fat - 109 + per_sector - 2) // (per_sector - 1))
+        if (need_fat, difat_count) == (fat_count, need_difat):
+            break
+        fat_count, difat_count = need_fat, need_difat
+    total = sum(counts) + fat_count + difat_count
+
+    order = list(range(total))
+    rnd.shuffle(order)
+    order = iter(order)
+
+    fat = [FREE] * (fat_count * per_sector)
+    sectors = {}
+    chains = {}
+    for (key, data), count in zip(payloads, counts):
+        chain = chains[key] = [next(order) for _ in range(count)]
+        for i, sector in enumerate(chain):
+            fat[sector] = chain[i + 1] if i < count - 1 else END_OF_CHAIN
+            sectors[sector] = data[i * sector_size:(i + 1) * sector_size]
+    fat_sectors = [next(order) for _ in range(fat_count)]
+    difat_sectors = [next(order) for _ in range(difat_count)]
+    for sector in fat_sectors:
+        fat[sector] = FAT_SECTOR
+    for sector in difat_sectors:
+        fat[sector] = DIFAT_SECTOR
+
+    def first(key):
+        return chains[key][0] if chains[key] else END_OF_CHAIN
+
+    # Каталог: корень и его дети цепочкой правых соседей
+    directory = [_entry('Root Entry', 5, FREE, FREE, 1 if entries else FREE, first('mini'), len(mini))]
+    for i, (name, start, size) in enumerate(entries):
+        right = i + 2 if i + 1 < len(entries) else FREE
+        directory.append(_entry(name, 2, FREE, right, FREE, first(name) if start is None else start, size))
+    directory = b''.join(directory)
+    directory += _entry('', 0, FREE, FREE, FREE, 0, 0) * (dir_sectors * sector_size // 128 - len(entries) - 1)
+    for i, sector in enumerate(chains['dir']):
+        sectors[sector] = directory[i * sector_size:(i + 1) * sector_size]
+
+    for i, sector in enumerate(fat_sectors):
+        sectors[sector] = struct.pack(f'<{per_sector}I', *fat[i * per_sector:(i + 1) * per_sector])
+    rest = fat_sectors[109:]
+    for i, sector in enumerate(difat_sectors):
+        part = rest[i * (per_sector - 1):(i + 1) * (per_sector - 1)]
+        part += [FREE] * (per_sector - 1 - len(part))
+        next_difat = difat_sectors[i + 1] if i + 1 < difat_count else END_OF_CHAIN
+        sectors[sector] = struct.pack(f'<{per_sector}I', *part, next_difat)
+
+    difat = fat_sectors[:109] + [FREE] * (109 - min(109, fat_count))
+    header = MAGIC + b'\0' * 16 + struct.pack(
+        '<HHHHH6sIIIIIIIII109I', 0x3E, version, 0xFFFE, 9 if version == 3 else 12, 6, b'\0' * 6,
+        dir_sectors if version == 4 else 0, fat_count, first('dir'), 0, MINI_CUTOFF,
+        first('minifat'), len(chains['minifat']), difat_sectors[0] if difat_sectors else END_OF_CHAIN,
+        difat_count, *difat)
+    out = bytearray(header + b'\0' * (sector_size - len(header)))
+    for sector in range(total):
+        data = sectors.get(sector, b'')
+        out += data + b'\0' * (sector_size - len(data))
+    return bytes(out), chains, fat_sectors, sector_size
+
+
+def set_next(data: bytes, fat_sectors: list, sector_size: int, sector: int, value: int) -> bytes:
+    """
+    Возвращает копию файла, в которой запись FAT для sector заменена на value
+    """
+    per_sector = sector_size // 4
+    offset = (fat_sectors[sector // per_sector] + 1) * sector_size + sector % per_sector * 4
+    return data[:offset] + struct.pack('<I', value) + data[offset + 4:]
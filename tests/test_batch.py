@@ -0,0 +1,19 @@
+from scene_parser.product.batch import iter_scene_files
+
+from blend_builder import make_blend
+
+
+def test_iter_scene_files(tmp_path):
+    data = make_blend({'r.pic': 'frame'})
+    (tmp_path / 'scene.blend').write_bytes(data)
+    # Загруженная сцена с неверным расширением
+    (tmp_path / 'upload.bin').write_bytes(data)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'upload').write_bytes(data)
+    (tmp_path / 'notes.txt').write_text('not a scene')
+
+    assert list(iter_scene_files([str(tmp_path)])) == [str(tmp_path / 'scene.blend')]
+    assert list(iter_scene_files([str(tmp_path)], sniff_content=True)) == [
+        str(tmp_path / 'scene.blend'), str(tmp_path / 'sub' / 'upload'), str(tmp_path / 'upload.bin')]
+    # Файлы, переданные явно, не фильтруются
+    assert list(iter_scene_files([str(tmp_path / 'notes.txt')])) == [str(tmp_path / 'notes.txt')]
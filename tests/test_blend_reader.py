@@ -0,0 +1,104 @@
+import gzip
+import io
+
+import pytest
+
+from scene_parser.parser.blend_reader import BlendReader
+
+from blend_builder import STRUCTS_249, make_blend
+
+SCENE = {
+    'id.name': 'SCScene', 'r.sfra': 5, 'r.efra': 250, 'r.frame_step': 2, 'r.xsch': 1920, 'r.ysch': 1080,
+    'r.im_format.imtype': 17, 'r.pic': '//render/frame_####', 'r.engine': 'CYCLES', 'r.mat': [1, 2, 3, 4, 5, 6],
+}
+
+HEADERS = [
+    pytest.param(dict(pointer_size=8, endian='<'), id='64-le'),
+    pytest.param(dict(pointer_size=4, endian='<'), id='32-le'),
+    pytest.param(dict(pointer_size=8, endian='>'), id='64-be'),
+    pytest.param(dict(pointer_size=4, endian='>'), id='32-be'),
+    pytest.param(dict(large=True, version=500), id='large'),
+]
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    zstandard = pytest.importorskip('zstandard')
+    compressor = zstandard.ZstdCompressor()
+    # Blender пишет zstd несколькими кадрами
+    return b''.join(compressor.compress(data[i:i + 256]) for i in range(0, len(data), 256))
+
+
+def _check(reader: BlendReader, version: int = 293) -> None:
+    assert reader.version == version
+    scene = reader.find_block(b'SC')
+    assert reader.get(scene, (b'id', b'name')) == 'SCScene'
+    assert reader.get(scene, (b'r', b'sfra')) == 5
+    assert reader.get(scene, (b'r', b'efra')) == 250
+    assert reader.get(scene, (b'r', b'xsch')) == 1920
+    assert reader.get(scene, (b'r', b'im_format', b'imtype')) == 17
+    assert reader.get(scene, (b'r', b'pic')) == '//render/frame_####'
+    assert reader.get(scene, (b'r', b'engine')) == 'CYCLES'
+    assert reader.get(scene, (b'r', b'mat')) == [1, 2, 3, 4, 5, 6]
+    names = [reader.get(block, (b'id', b'name')) for block in reader.find_blocks(b'OB')]
+    assert names == ['OBCube', 'OBCamera', 'OBCam.001']
+
+
+@pytest.mark.parametrize('header', HEADERS)
+def test_headers(header):
+    data = make_blend(SCENE, ['Camera', 'Cam.001'], **header)
+    reader = BlendReader(data)
+    assert reader.pointer_size == header.get('pointer_size', 8)
+    _check(reader, header.get('version', 293))
+    reader.close()
+
+
+@pytest.mark.parametrize('header', HEADERS)
+@pytest.mark.parametrize('compress', [gzip.compress, _zstd_compress], ids=['gzip', 'zstd'])
+def test_compressed(header, compress):
+    data = compress(make_blend(SCENE, ['Camera', 'Cam.001'], **header))
+    _check(BlendReader(data), header.get('version', 293))
+    _check(BlendReader(io.BytesIO(data)), header.get('version', 293))
+
+
+def test_inputs(tmp_path):
+    data = make_blend(SCENE, ['Camera', 'Cam.001'])
+    path = tmp_path / 'scene.blend'
+    path.write_bytes(data)
+
+    for file in (str(path), path, memoryview(data), bytearray(data), io.BytesIO(data)):
+        reader = BlendReader(file)
+        _check(reader)
+        reader.close()
+    with open(path, 'rb') as f:
+        reader = BlendReader(f)
+        _check(reader)
+        reader.close()
+
+
+def test_old_structs():
+    data = make_blend({'r.sfra': 1, 'r.imtype': 29, 'r.renderer': 1}, version=249, structs=STRUCTS_249)
+    reader = BlendReader(data)
+    scene = reader.find_block(b'SC')
+    assert reader.get(scene, (b'r', b'imtype')) == 29
+    assert reader.get(scene, (b'r', b'renderer')) == 1
+    assert reader.get(scene, (b'r', b'engine'), None) is None
+    with pytest.raises(KeyError):
+        reader.get(scene, (b'r', b'im_format', b'imtype'))
+
+
+def test_missing_block():
+    reader = BlendReader(make_blend(SCENE))
+    assert reader.find_block(b'XX') is None
+    assert reader.find_blocks(b'CA') == []
+
+
+@pytest.mark.parametrize('data', [
+    pytest.param(b'', id='empty'),
+    pytest.param(b'not a blend file', id='magic'),
+    pytest.param(b'BLENDER17-02v0500' + b'\0' * 64, id='header'),
+    pytest.param(make_blend(SCENE, dna=False), id='no-dna'),
+    pytest.param(make_blend(SCENE)[:200], id='truncated'),
+])
+def test_invalid(data):
+    with pytest.raises(ValueError):
+        BlendReader(data)
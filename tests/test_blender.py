@@ -0,0 +1,95 @@
+import gzip
+
+import pytest
+
+from scene_parser.exception.invalid_magic import InvalidMagicException
+from scene_parser.product.impl.Blender import Blender, get_engine_by_, get_ext_by_
+
+from blend_builder import STRUCTS_249, make_blend
+
+SCENE = {
+    'id.name': 'SCScene', 'r.sfra': 5, 'r.efra': 250, 'r.frame_step': 2, 'r.xsch': 1920, 'r.ysch': 1080,
+    'r.im_format.imtype': 17, 'r.pic': 'C:\\render\\frame_####', 'r.engine': 'BLENDER_EEVEE',
+}
+
+RESULT = {
+    'product': 'blender', 'version': '2.93', 'firstFrame': 5, 'lastFrame': 250, 'nthFrame': 2,
+    'width': 1920, 'height': 1080, 'render': 'EEVEE', 'outputName': 'frame_####', 'ext': 'png',
+    'cameras': ['Camera', 'Cam.001'],
+}
+
+
+def test_extract(tmp_path):
+    path = tmp_path / 'scene.blend'
+    path.write_bytes(make_blend(SCENE, ['Camera', 'Cam.001']))
+    with open(path, 'rb') as f:
+        assert Blender(f).extract() == RESULT
+
+
+def test_extract_from_bytes():
+    data = gzip.compress(make_blend(SCENE, ['Camera', 'Cam.001']))
+    assert Blender(data).extract_from_bytes(data) == RESULT
+
+
+@pytest.mark.parametrize('data', [
+    pytest.param(b'not a blend file', id='magic'),
+    pytest.param(make_blend(SCENE, dna=False), id='no-dna'),
+    pytest.param(make_blend(SCENE)[:300], id='truncated'),
+    pytest.param(make_blend(SCENE).replace(b'SC\0\0', b'XX\0\0'), id='no-scene'),
+    pytest.param(gzip.compress(make_blend(SCENE))[:100], id='truncated-gzip'),
+])
+def test_invalid(tmp_path, data):
+    path = tmp_path / 'scene.blend'
+    path.write_bytes(data)
+    with open(path, 'rb') as f:
+        with pytest.raises(InvalidMagicException):
+            Blender(f).extract()
+    with pytest.raises(InvalidMagicException):
+        Blender(data).extract_from_bytes(data)
+
+
+@pytest.mark.parametrize('id, version, ext', [
+    (17, None, 'png'),
+    (17, 249, 'png'),
+    (28, 249, 'open_exr_multilayer'),
+    (29, 249, 'dds'),
+    (30, 249, 'jp2'),
+    (31, 249, 'h264'),
+    (33, 293, 'theora'),
+    (34, 249, 'psd'),
+    # Форматы, убранные в 2.50 и 2.80
+    (2, 249, 'hamx'),
+    (2, 250, None),
+    (18, 279, 'avi_codec'),
+    (18, 280, None),
+    (15, 401, 'avi_raw'),
+    (15, 402, None),
+    (35, 303, None),
+    (35, 304, 'webp'),
+    (36, None, 'av1'),
+    ('17', 293, 'png'),
+    (99, 293, None),
+    (None, 293, None),
+])
+def test_get_ext_by_version(id, version, ext):
+    assert get_ext_by_(id, version)[1] == ext
+
+
+@pytest.mark.parametrize('id, version, engine', [
+    (0, 249, 'BLENDER_RENDER'),
+    (1, 249, 'YAFRAY'),
+    (0, 250, None),
+    (1, None, 'YAFRAY'),
+])
+def test_get_engine_by_version(id, version, engine):
+    assert get_engine_by_(id, version)[1] == engine
+
+
+def test_extract_249():
+    data = make_blend({'r.sfra': 1, 'r.efra': 10, 'r.xsch': 720, 'r.ysch': 576, 'r.pic': '/tmp/render',
+                       'r.imtype': 29, 'r.renderer': 1}, version=249, structs=STRUCTS_249)
+    result = Blender(data).extract_from_bytes(data)
+    assert result['version'] == '2.49'
+    assert result['ext'] == 'dds'
+    assert 'ext_id' not in result
+    assert result['render'] == 'YAFRAY'
@@ -0,0 +1,54 @@
+import mmap
+
+import pytest
+
+from scene_parser.benchmarks.max_summary import make_summary
+from scene_parser.product.sniff import extract, extract_bytes
+
+from blend_builder import make_blend
+from cfb_builder import make_cfb
+
+
+def _make_hiplc() -> bytes:
+    entries = [
+        ('.variables', "set -g HIP = '/proj'\nset -g _HIP_SAVEVERSION = '19.5.303'\n"),
+        ('out/mantra1.parm', '{\nsoho_pipecmd\t[ 0\tlocks=0 ]\t(\t"mantra"\t)\n'
+                             'f\t[ 0\tlocks=0 ]\t(\t1\t240\t1\t)\n}\n'),
+        ('TRAILER!!!', ''),
+    ]
+    return ''.join(f'HouLC\x1a{"F" * 28}{name}\0{data}' for name, data in entries).encode()
+
+
+SCENES = [
+    pytest.param(_make_hiplc, id='hiplc'),
+    pytest.param(lambda: make_blend({'r.pic': 'frame', 'r.engine': 'CYCLES'}, ['Camera']), id='blend'),
+    pytest.param(lambda: make_cfb([('\x05DocumentSummaryInformation', make_summary(2, 3))])[0], id='max'),
+]
+
+
+@pytest.mark.parametrize('make', SCENES)
+def test_bytes(tmp_path, make):
+    data = make()
+    path = tmp_path / 'scene'
+    path.write_bytes(data)
+    expected = extract(str(path))
+    assert extract_bytes(data) == expected
+    assert extract_bytes(bytearray(data)) == expected
+    assert extract_bytes(memoryview(data)[:]) == expected
+
+
+@pytest.mark.parametrize('make', SCENES)
+def test_mmap_view(tmp_path, make):
+    """
+    Отображение принадлежит вызывающему: парсер не должен его закрывать
+    """
+    path = tmp_path / 'scene'
+    path.write_bytes(make())
+    expected = extract(str(path))
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with memoryview(mm) as view:
+        assert extract_bytes(view) == expected
+        assert extract_bytes(view) == expected
+    assert not mm.closed
+    mm.close()
@@ -0,0 +1,94 @@
+import mmap
+import struct
+
+import pytest
+
+from scene_parser.parser.maya_iff_parser import MayaIFFParser
+
+
+def _chunk(chunk_id: bytes, payload: bytes, ptr_size: int) -> bytes:
+    if ptr_size == 8:
+        header = struct.pack('>4sLQ', chunk_id, 0, len(payload))
+    else:
+        header = struct.pack('>4sL', chunk_id, len(payload))
+    return header + payload + b'\0' * ((ptr_size - len(payload) % ptr_size) % ptr_size)
+
+
+def _list(name: bytes, children: list, ptr_size: int) -> bytes:
+    # Список не выравнивается, выравниваются только чанки внутри него
+    body = name + b''.join(children)
+    if ptr_size == 8:
+        return struct.pack('>4sLQ', b'FOR8', 0, len(body)) + body
+    return struct.pack('>4sL', b'FOR4', len(body)) + body
+
+
+def _make_scene(ptr_size: int) -> bytes:
+    head = _list(b'HEAD', [_chunk(b'FINF', b'product\0Maya 2024\0', ptr_size)], ptr_size)
+    cameras = [
+        _list(b'CAMR', [_chunk(b'DBLE', b'fl\0\0' + struct.pack('>d', i), ptr_size)], ptr_size)
+        for i in range(4)
+    ]
+    return _list(b'Maya', [head] + cameras, ptr_size)
+
+
+REQUESTED = {'/Maya/HEAD/product': 'product'}
+
+
+@pytest.mark.parametrize('ptr_size', [4, 8])
+def test_truncated_file_with_index(tmp_path, ptr_size):
+    """
+    Обрезанный файл с индексом читается так же, как без него: неполный заголовок -- конец файла
+    """
+    data = _make_scene(ptr_size)
+    # Конец HEAD, дальше идут только списки, которые не запрошены
+    head_end = data.index(b'CAMR') - 2 * ptr_size
+    for size in range(head_end, len(data)):
+        path = tmp_path / f'scene_{size}.mb'
+        path.write_bytes(data[:size])
+        with open(path, 'rb') as f:
+            expected = MayaIFFParser(f).parse(REQUESTED)
+        with open(path, 'rb') as f:
+            assert MayaIFFParser(f).parse(REQUESTED, use_index=True) == expected == {'product': 'Maya 2024'}
+
+
+def test_mmap_view(tmp_path):
+    """
+    Отображение, переданное вызывающим, парсер не закрывает
+    """
+    path = tmp_path / 'scene.mb'
+    path.write_bytes(_make_scene(8))
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with memoryview(mm) as view:
+        parser = MayaIFFParser(view)
+        assert parser.parse(REQUESTED) == {'product': 'Maya 2024'}
+        parser.close()
+    assert not mm.closed
+    mm.close()
+
+
+@pytest.mark.parametrize('ptr_size', [4, 8])
+def test_iter_chunks_paths(ptr_size):
+    data = _make_scene(ptr_size)
+    cameras = [('/Maya/CAMR', 'fl', float(i)) for i in range(4)]
+    assert list(MayaIFFParser(data).iter_chunks()) == [('/Maya/HEAD', 'product', 'Maya 2024')] + cameras
+    assert list(MayaIFFParser(data).iter_matches({'/Maya/CAMR/fl': 'fl[]'})) == cameras
+    for recursive in (True, False):
+        assert MayaIFFParser(data).parse({'/Maya/CAMR/fl': 'fl[]'}, recursive) == {'fl': [0.0, 1.0, 2.0, 3.0]}
+
+
+@pytest.mark.parametrize('recursive', [True, False])
+def test_unrequested_values_not_decoded(tmp_path, recursive):
+    """
+    В списке, в который спускается обход, значения незапрошенных ключей не декодируются:
+    битый PLUG рядом с запрошенным FINF не мешает разбору
+    """
+    head = _list(b'HEAD', [_chunk(b'PLUG', b'broken', 4), _chunk(b'FINF', b'product\0Maya 2024\0', 4)], 4)
+    data = _list(b'Maya', [head], 4)
+    path = tmp_path / 'scene.mb'
+    path.write_bytes(data)
+    with open(path, 'rb') as f:
+        assert MayaIFFParser(f).parse(REQUESTED, recursive) == {'product': 'Maya 2024'}
+    with open(path, 'rb') as f:
+        assert MayaIFFParser(f, use_mmap=True).parse(REQUESTED, recursive) == {'product': 'Maya 2024'}
+    assert MayaIFFParser(data).parse(REQUESTED, recursive) == {'product': 'Maya 2024'}
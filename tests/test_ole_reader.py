@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from scene_parser.parser.ole_reader import OleReader
+
+from cfb_builder import make_cfb, set_next
+
+
+def _data(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_regular_chain(version):
+    streams = [('Big', _data(10000, 1)), ('Other', _data(5000, 2))]
+    data, chains, _, _ = make_cfb(streams, version)
+    reader = OleReader(data)
+    assert reader.read_stream('Big') == streams[0][1]
+    # Имена сравниваются без учёта регистра
+    assert reader.read_stream('OTHER') == streams[1][1]
+
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_mini_stream_chain(version):
+    streams = [('\x05DocumentSummaryInformation', _data(3000, 1)), ('Small', _data(100, 2)), ('Empty', b'')]
+    data, _, _, _ = make_cfb(streams, version)
+    reader = OleReader(data)
+    for name, content in streams:
+        assert reader.read_stream(name) == content
+
+
+def test_file_and_stream_input(tmp_path):
+    streams = [('Big', _data(10000, 1)), ('Small', _data(100, 2))]
+    path = tmp_path / 'scene.max'
+    path.write_bytes(make_cfb(streams)[0])
+
+    reader = OleReader(str(path))
+    assert reader.read_stream('Small') == streams[1][1]
+    reader.close()
+    with open(path, 'rb') as f:
+        reader = OleReader(f)
+        assert reader.read_stream('Big') == streams[0][1]
+        reader.close()
+
+
+def test_difat():
+    streams = [('Big', _data(20000, 1)), ('Small', _data(100, 2))]
+    # 109 секторов FAT в заголовке покрывают 109 * 128 секторов, остальные ищутся через DIFAT
+    data, chains, fat_sectors, _ = make_cfb(streams, 3, pad_sectors=130 * 128)
+    assert len(fat_sectors) > 109
+    assert max(chains['Big']) >= 109 * 128
+    reader = OleReader(data)
+    assert reader.read_stream('Big') == streams[0][1]
+    assert reader.read_stream('Small') == streams[1][1]
+
+
+def test_stream_not_found():
+    reader = OleReader(make_cfb([('Big', _data(10000))])[0])
+    with pytest.raises(OSError):
+        reader.read_stream('Missing')
+
+
+def test_not_ole():
+    with pytest.raises(OSError):
+        OleReader(b'\0' * 1024)
+    with pytest.raises(OSError):
+        OleReader(b'')
+
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_truncated(version):
+    streams = [('Big', _data(10000, 1)), ('Small', _data(100, 2))]
+    data, _, _, sector_size = make_cfb(streams, version)
+    for size in range(sector_size, len(data), sector_size // 2):
+        try:
+            reader = OleReader(data[:size])
+            for name, content in streams:
+                assert reader.read_stream(name) == content
+        except OSError:
+            pass
+
+
+@pytest.mark.parametrize('key', ['Big', 'dir', 'minifat'])
+def test_looping_chain(key):
+    streams = [('Big', _data(10000, 1)), ('Small', _data(100, 2))]
+    data, chains, fat_sectors, sector_size = make_cfb(streams)
+    chain = chains[key]
+    data = set_next(data, fat_sectors, sector_size, chain[-1], chain[0])
+    with pytest.raises(OSError):
+        reader = OleReader(data)
+        for name, _ in streams:
+            reader.read_stream(name)
+
+
+def test_chain_out_of_file():
+    streams = [('Big', _data(10000, 1))]
+    data, chains, fat_sectors, sector_size = make_cfb(streams)
+    data = set_next(data, fat_sectors, sector_size, chains['Big'][0], 0x00FFFFFF)
+    with pytest.raises(OSError):
+        OleReader(data).read_stream('Big')